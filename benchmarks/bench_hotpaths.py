@@ -0,0 +1,349 @@
+"""microbenchmarks for the hot paths of the simulation, with a json history and regression check
+
+   every benchmark runs on a seeded world of the usual size (40 x 30 cells), so two runs measure the same work.
+   the result of every run is appended to the history file (benchmarks/history.json, it holds the timings of
+   this machine and is ignored by git), the median of the last runs on the same machine is the baseline.
+   a benchmark is a regression if it is slower than the baseline by more than --threshold.
+   exits with 1 if there is a regression. needs neither pygame nor a display.
+
+   besides the times, the bytes allocated per Box, Agent, Door and PressurePlate are measured (with tracemalloc,
+   including their entries in the Simulation tables) and saved as "memory" in the history. more bytes than the
+   baseline by more than --threshold is a regression, too.
+
+   usage (from the top folder of the repository):
+   python benchmarks/bench_hotpaths.py
+   python benchmarks/bench_hotpaths.py --threshold 0.2 --only fov --no-save
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fov_tools  # noqa: E402
+from simulation import (Simulation, Agent, Box, Door, PressurePlate, TILE_CLASSES, get_line,  # noqa: E402
+                        fov_rays, convert_fovmap_to_dataset)
+from vector_simulation import VectorSimulation  # noqa: E402
+from map_loader import MapCache, compile_map  # noqa: E402
+from numpy_model import NumpyModel  # noqa: E402
+
+SEED = 1
+WIDTH, HEIGHT, BOXES = 40, 30, 65
+
+
+def standard_world(fov_algorithm="raycasting"):
+    """the usual playfield with boxes and 3 seekers and 3 hiders, after one turn"""
+    Simulation.num_seekers, Simulation.num_hiders = 3, 3
+    Simulation.fov_algorithm = fov_algorithm
+    Simulation.setup(WIDTH, HEIGHT, BOXES, seed=SEED)
+    Simulation.tick()
+    return Simulation.agents[0]
+
+
+def empty_world():
+    """the playfield without boxes and agents"""
+    Simulation.num_seekers, Simulation.num_hiders = 0, 0
+    Simulation.fov_algorithm = "raycasting"
+    Simulation.setup(WIDTH, HEIGHT, 0, seed=SEED)
+
+
+# every benchmark prepares its world and returns the function to measure
+
+
+def bench_get_line():
+    endpoints = [ray[-1] for ray in fov_rays(5)]
+    return lambda: [get_line((20, 15), (20 + x, 15 + y)) for x, y in endpoints]
+
+
+def bench_make_fov_map():
+    agent = standard_world()
+    return agent.make_fov_map
+
+
+def bench_make_fov_map_remove_artifacts():
+    agent = standard_world()
+    return lambda: agent.make_fov_map(remove_artifacts=True)
+
+
+def bench_make_fov_map_shadowcasting():
+    agent = standard_world("shadowcasting")
+    return agent.make_fov_map
+
+
+def bench_fov_tools_make_fov_map():
+    agent = standard_world()
+    sim_tiles = [[TILE_CLASSES[code] for code in line] for line in Simulation.tile_types]
+    return lambda: fov_tools.make_fov_map(agent, sim_tiles)
+
+
+def bench_convert_fovmap_to_dataset():
+    agent = standard_world()
+    return lambda: convert_fovmap_to_dataset(Simulation.seeker_fov_map, agent)
+
+
+def bench_box_move_chain():
+    """a row of 10 boxes, the first one is kicked into the others. measures the moves until all boxes stop"""
+    empty_world()
+    boxes = [Box(5 + i, 20) for i in range(10)]
+
+    def run():
+        for i, box in enumerate(boxes):
+            Simulation.relocate(box, 5 + i, 20)
+            box.dx, box.dy, box.d, box.friction = 0, 0, 0, 255
+        boxes[0].dx = 1
+        while any(box.dx or box.dy for box in boxes):
+            for box in boxes:
+                box.move()
+    return run
+
+
+def bench_agent_move_collisions():
+    """an agent with a wall in the north, a box in the east and a seeker in the west.
+       it runs into all of them and steps south and back"""
+    empty_world()
+    agent = Agent(seeker=True, x=30, y=1)
+    Box(31, 1)
+    Agent(seeker=True, x=29, y=1)
+
+    def run():
+        agent.move(0, -1)
+        agent.move(1, 0)
+        agent.move(-1, 0)
+        agent.move(0, 1)
+        agent.move(0, -1)
+    return run
+
+
+def bench_tick():
+    """100 turns from the same start, so every measurement plays exactly the same turns"""
+    def run():
+        standard_world()
+        for _ in range(100):
+            Simulation.tick()
+    return run
+
+
+def bench_tick_shadowcasting():
+    def run():
+        standard_world("shadowcasting")
+        for _ in range(100):
+            Simulation.tick()
+    return run
+
+
+def bench_setup():
+    def run():
+        Simulation.num_seekers, Simulation.num_hiders = 3, 3
+        Simulation.setup(WIDTH, HEIGHT, BOXES, seed=SEED)
+    return run
+
+
+def bench_setup_large():
+    def run():
+        Simulation.num_seekers, Simulation.num_hiders = 3, 3
+        Simulation.setup(200, 200, 2000, seed=SEED)
+    return run
+
+
+MAP_FILE = os.path.join(ROOT, "maps", "maze1.txt")
+MAP_CACHE = tempfile.TemporaryDirectory()  # the benchmarks do not touch the cache of the user
+MapCache.cache_dir = MAP_CACHE.name
+
+
+def bench_compile_map():
+    with open(MAP_FILE) as f:
+        text = f.read()
+    return lambda: compile_map(text)
+
+
+def bench_map_from_disk_cache():
+    """a map that is cached on disk, but not yet in this process"""
+    MapCache.load(MAP_FILE)
+
+    def run():
+        MapCache.clear()
+        MapCache.load(MAP_FILE)
+    return run
+
+
+def bench_map_cached():
+    MapCache.load(MAP_FILE)
+    return lambda: MapCache.load(MAP_FILE)
+
+
+def bench_setup_compiled_map():
+    game_map = MapCache.load(MAP_FILE)
+
+    def run():
+        Simulation.num_seekers, Simulation.num_hiders = 3, 3
+        Simulation.setup(boxes=BOXES, seed=SEED, game_map=game_map)
+    return run
+
+
+def bench_numpy_model_predict():
+    """one turn of a team in Simulation.smart_actions: 3 agents x 8 actions, with a model like train.py builds"""
+    rng = np.random.default_rng(SEED)
+    model = NumpyModel([rng.normal(size=(15, 64)), rng.normal(size=(64, 32)), rng.normal(size=(32, 1))],
+                       [np.zeros(64), np.zeros(32), np.zeros(1)], ["relu", "relu", "linear"])
+    features = rng.integers(0, 2, (24, 15))
+    return lambda: model.predict(features)
+
+
+def bench_vector_step_100_worlds():
+    vector = VectorSimulation(100, WIDTH, HEIGHT, BOXES, seed=SEED)
+
+    def run():
+        vector.step()
+        vector.reset(vector.game_over())
+    return run
+
+
+BENCHMARKS = {
+    "get_line (40 rays)": bench_get_line,
+    "Agent.make_fov_map": bench_make_fov_map,
+    "Agent.make_fov_map remove_artifacts": bench_make_fov_map_remove_artifacts,
+    "Agent.make_fov_map shadowcasting": bench_make_fov_map_shadowcasting,
+    "fov_tools.make_fov_map": bench_fov_tools_make_fov_map,
+    "convert_fovmap_to_dataset": bench_convert_fovmap_to_dataset,
+    "Box.move chain (10 boxes)": bench_box_move_chain,
+    "Agent.move collisions (5 moves)": bench_agent_move_collisions,
+    "Simulation.tick (100 turns)": bench_tick,
+    "Simulation.tick shadowcasting (100 turns)": bench_tick_shadowcasting,
+    "Simulation.setup": bench_setup,
+    "Simulation.setup (200 x 200, 2000 boxes)": bench_setup_large,
+    "Simulation.setup (compiled map)": bench_setup_compiled_map,
+    "compile_map": bench_compile_map,
+    "MapCache.load (disk cache)": bench_map_from_disk_cache,
+    "MapCache.load (in memory)": bench_map_cached,
+    "NumpyModel.predict (24 rows)": bench_numpy_model_predict,
+    "VectorSimulation.step (100 worlds)": bench_vector_step_100_worlds,
+}
+
+
+def entity_bytes(make, count=1000):
+    """bytes allocated per call of make, on an empty 200 x 200 playfield"""
+    Simulation.num_seekers, Simulation.num_hiders = 0, 0
+    Simulation.setup(200, 200, 0, seed=SEED)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        make(i)  # the Simulation tables keep the entity
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return allocated / count
+
+
+MEMORY = {
+    "Box": lambda i: Box(),
+    "Agent": lambda i: Agent(seeker=i % 2 == 0),
+    "Door": lambda i: Door(1 + i % 198, 1 + i // 198, key=1),
+    "PressurePlate": lambda i: PressurePlate(1 + i % 198, 1 + i // 198, key=1),
+}
+
+
+def measure(make, repeat):
+    """returns the best time of one call, in seconds"""
+    timer = timeit.Timer(make())
+    number, _ = timer.autorange()  # calls per measurement, so that one measurement takes at least 0.2 seconds
+    return min(timer.repeat(repeat, number)) / number
+
+
+def machine():
+    return f"{platform.node()} {platform.machine()} python {platform.python_version()}"
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(filename):
+    if not os.path.exists(filename):
+        return []
+    with open(filename) as f:
+        return json.load(f)
+
+
+def baselines(history, runs, key="results"):
+    """{benchmark name: median of its last runs results (or memory) on this machine}"""
+    results = {}  # {name: [seconds or bytes]}
+    for entry in history:
+        if entry["machine"] != machine():
+            continue  # other hardware, not comparable
+        for name, value in entry.get(key, {}).items():
+            results.setdefault(name, []).append(value)
+    return {name: statistics.median(values[-runs:]) for name, values in results.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="microbenchmarks for the simulation hot paths")
+    parser.add_argument("--history", default=os.path.join(ROOT, "benchmarks", "history.json"),
+                        help="json file with the results of all runs")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="regression if slower than the baseline by more than this (0.1 = 10%%)")
+    parser.add_argument("--baseline-runs", type=int, default=5, help="the baseline is the median of this many runs")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements per benchmark, the best counts")
+    parser.add_argument("--only", default="", help="only run benchmarks with this text in their name")
+    parser.add_argument("--no-save", action="store_true", help="do not append this run to the history")
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    baseline = baselines(history, args.baseline_runs)
+    results = {}
+    regressions = []
+    for name, make in BENCHMARKS.items():
+        if args.only not in name:
+            continue
+        seconds = measure(make, args.repeat)
+        results[name] = seconds
+        line = f"{name:40} {seconds * 1e6:12.1f} us"
+        if name in baseline:
+            change = seconds / baseline[name] - 1
+            line += f"  {change:+7.1%} vs {baseline[name] * 1e6:.1f} us"
+            if change > args.threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+    memory_baseline = baselines(history, args.baseline_runs, "memory")
+    memory = {}
+    for name, make in MEMORY.items():
+        if args.only not in name:
+            continue
+        memory[name] = entity_bytes(make)
+        line = f"{'bytes per ' + name:40} {memory[name]:12.0f} B"
+        if name in memory_baseline:
+            change = memory[name] / memory_baseline[name] - 1
+            line += f"  {change:+7.1%} vs {memory_baseline[name]:.0f} B"
+            if change > args.threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+    if "pygame" in sys.modules:
+        print("FAIL: the benchmarks imported pygame")
+        return 1
+    if not args.no_save:
+        history.append({"date": datetime.datetime.now().isoformat(timespec="seconds"), "commit": commit(),
+                        "machine": machine(), "results": results, "memory": memory})
+        with open(args.history, "w") as f:
+            json.dump(history, f, indent=1)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
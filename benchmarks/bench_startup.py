@@ -0,0 +1,71 @@
+"""startup benchmark: how long does it take until a worker process can play its first turn?
+
+   every measurement runs in a fresh python process. besides the time, this checks that
+   the heavy libraries (tensorflow, matplotlib, sklearn, pygame) are NOT imported by the headless modules
+   and that playing random turns does not import tensorflow.
+   exits with 1 if a heavy library shows up or the startup takes longer than --max-seconds.
+
+   usage (from the top folder of the repository):
+   python benchmarks/bench_startup.py --repeat 5 --max-seconds 1.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("tensorflow", "matplotlib", "sklearn", "pygame")
+
+# python code that runs in the fresh process. it prints a json dict with the time and the loaded heavy modules
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds,
+                  "heavy": sorted({{m.split(".")[0] for m in sys.modules}} & set({heavy!r}))}}))
+"""
+
+CASES = {
+    "import simulation": "import simulation",
+    "import headless": "import headless",
+    "import rollout_farm": "import rollout_farm",
+    "import binary_dataset": "import binary_dataset",
+    "first random turn": "from simulation import Simulation\n"
+                         "Simulation.setup(40, 30, 60, seed=1)\n"
+                         "Simulation.tick()",
+}
+
+
+def measure(code):
+    result = subprocess.run([sys.executable, "-c", PROBE.format(code=code, heavy=HEAVY)], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    # the last line is the json, the simulation may print other things before it
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="measure the startup time of the headless modules")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes per case, the median counts")
+    parser.add_argument("--max-seconds", type=float, default=1.0, help="fail if a case takes longer")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name, code in CASES.items():
+        runs = [measure(code) for _ in range(args.repeat)]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        heavy = sorted({module for run in runs for module in run["heavy"]})
+        problems = []
+        if heavy:
+            problems.append("imports " + ", ".join(heavy))
+        if seconds > args.max_seconds:
+            problems.append(f"slower than {args.max_seconds} s")
+        failed = failed or bool(problems)
+        print(f"{name:25} {seconds * 1000:8.1f} ms  {'FAIL: ' + '; '.join(problems) if problems else 'ok'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""compact binary episode format, the alternative to data_hiders.csv / data_seekers.csv
+
+   an episode directory holds one sub-directory per team ("hiders" and "seekers").
+   every column of the dataset is stored in its own file as raw little-endian numbers,
+   one value per row (columnar layout), the fov of each row is one uint8 observation grid
+   (height x width, see simulation.fovmap_to_observation):
+
+   episode/
+       meta.json            height, width and the dtype of every column
+       hiders/fov.bin       uint8, rows x height x width
+       hiders/GoNorth.bin   uint8, rows
+       ...
+       hiders/Points.bin    int16, rows
+       seekers/...
+
+   read_episode() memory-maps these files, nothing is parsed.
+"""
+import json
+import os
+
+import numpy as np
+
+from simulation import Simulation, DATASET_COLUMNS_BEFORE_FOV, DATASET_COLUMNS_AFTER_FOV
+
+TEAMS = {False: "hiders", True: "seekers"}
+# dtype of every column of agent.dataset, except the fov columns
+COLUMN_DTYPES = {name: "<i2" if name in ("PosX", "PosY", "Points") else "u1"
+                 for name in DATASET_COLUMNS_BEFORE_FOV + DATASET_COLUMNS_AFTER_FOV}
+FORMAT_VERSION = 1
+
+
+class EpisodeWriter:
+    """same interface as dataset_writer.DatasetWriter, but writes the binary episode format"""
+
+    def __init__(self, directory=".", max_rows=1000):
+        self.directory = directory
+        self.max_rows = max_rows
+        self.height = Simulation.height
+        self.width = Simulation.width
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"version": FORMAT_VERSION, "height": self.height, "width": self.width,
+                       "columns": COLUMN_DTYPES}, f, indent=1)
+        self.files = {}  # {(seeker, column name): open file}
+        for seeker, team in TEAMS.items():
+            os.makedirs(os.path.join(directory, team), exist_ok=True)
+            for name in ("fov",) + tuple(COLUMN_DTYPES):
+                self.files[(seeker, name)] = open(os.path.join(directory, team, name + ".bin"), "wb")
+        self.rows = {False: [], True: []}  # {seeker: [(dataset, observation)]}
+        self.waiting = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, agent):
+        """buffers agent.dataset and agent.observation as one row of the agent's team"""
+        self.rows[agent.seeker].append((agent.dataset, agent.observation))
+        self.waiting += 1
+        if self.waiting >= self.max_rows:
+            self.flush()
+
+    def flush(self):
+        before, after = len(DATASET_COLUMNS_BEFORE_FOV), len(DATASET_COLUMNS_AFTER_FOV)
+        for seeker, rows in self.rows.items():
+            if not rows:
+                continue
+            self.rows[seeker] = []
+            np.stack([observation for dataset, observation in rows]).astype("u1").tofile(
+                self.files[(seeker, "fov")])
+            # the fov columns in the middle of agent.dataset are left out, the observation has them
+            table = np.array([dataset[:before] + dataset[-after:] for dataset, observation in rows])
+            for i, (name, dtype) in enumerate(COLUMN_DTYPES.items()):
+                table[:, i].astype(dtype).tofile(self.files[(seeker, name)])
+        self.waiting = 0
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            for f in self.files.values():
+                f.close()
+            self.closed = True
+
+
+def read_episode(directory):
+    """memory-maps an episode written by EpisodeWriter
+
+       returns: {"hiders": {"fov": array rows x height x width, "GoNorth": array, ...}, "seekers": {...}}
+       all arrays are read-only views into the files
+    """
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["version"] != FORMAT_VERSION:
+        raise ValueError(f"unknown episode format version {meta['version']} in {directory}")
+    cell_shape = (meta["height"], meta["width"])
+    episode = {}
+    for team in TEAMS.values():
+        columns = {"fov": _map(os.path.join(directory, team, "fov.bin"), "u1", cell_shape)}
+        for name, dtype in meta["columns"].items():
+            columns[name] = _map(os.path.join(directory, team, name + ".bin"), dtype)
+        episode[team] = columns
+    return episode
+
+
+def _map(filename, dtype, cell_shape=()):
+    dtype = np.dtype(dtype)
+    rows = os.path.getsize(filename) // (dtype.itemsize * int(np.prod(cell_shape, dtype=int)))
+    if rows == 0:
+        return np.zeros((0,) + cell_shape, dtype=dtype)  # an empty file can not be memory-mapped
+    return np.memmap(filename, dtype=dtype, mode="r", shape=(rows,) + cell_shape)
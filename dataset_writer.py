@@ -0,0 +1,97 @@
+"""buffered writer for data_hiders.csv and data_seekers.csv
+
+   instead of opening the csv file for every row, the files stay open and rows are collected in memory.
+   they are written when max_rows rows are waiting or max_seconds have passed since the last write.
+   with background=True, a thread does the writing, so the simulation never waits for the disk.
+"""
+import os
+import queue
+import threading
+import time
+
+from simulation import dataset_header
+
+
+class DatasetWriter:
+
+    def __init__(self, directory=".", max_rows=1000, max_seconds=1.0, background=False, height=None):
+        """creates (or empties) data_hiders.csv and data_seekers.csv in directory and writes the header line.
+           height is the number of fov columns, default: Simulation.height
+        """
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.files = {False: open(os.path.join(directory, "data_hiders.csv"), "w"),
+                      True: open(os.path.join(directory, "data_seekers.csv"), "w")}
+        self.buffers = {False: [dataset_header(height)], True: [dataset_header(height)]}  # {seeker: [lines]}
+        self.waiting = 0  # number of rows in the buffers
+        self.last_flush = time.monotonic()
+        self.closed = False
+        self.queue = None
+        self.thread = None
+        self.error = None  # exception of the background thread
+        if background:
+            self.queue = queue.Queue()
+            self.thread = threading.Thread(target=self._write_loop, name="DatasetWriter", daemon=True)
+            self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, agent):
+        """buffers agent.dataset as one line for the csv file of the agent's team"""
+        self.add_row(agent.seeker, agent.dataset)
+
+    def add_row(self, seeker, dataset):
+        """buffers one row (a list like agent.dataset) for the csv file of the seekers or hiders"""
+        self.buffers[seeker].append(",".join(map(str, dataset)) + "\n")
+        self.waiting += 1
+        if self.waiting >= self.max_rows or time.monotonic() - self.last_flush >= self.max_seconds:
+            self.flush()
+
+    def flush(self):
+        """writes all buffered rows (in the background thread, if there is one)"""
+        if self.error is not None:
+            raise self.error
+        for seeker, lines in self.buffers.items():
+            if not lines:
+                continue
+            text = "".join(lines)
+            self.buffers[seeker] = []
+            if self.queue is not None:
+                self.queue.put((self.files[seeker], text))
+            else:
+                self.files[seeker].write(text)
+        self.waiting = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        """writes everything that is left and closes the files. call this at the end of every episode.
+           if the last write fails, the thread is still stopped and the files are closed before the error is raised
+        """
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            if self.thread is not None:
+                self.queue.put(None)
+                self.thread.join()
+            for f in self.files.values():
+                f.close()
+            self.closed = True
+        if self.error is not None:
+            raise self.error
+
+    def _write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            f, text = item
+            try:
+                f.write(text)
+            except OSError as error:
+                self.error = error
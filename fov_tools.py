@@ -169,6 +169,80 @@ def calculate_fov_points(pointlist, agent, sim_tiles, fov_map):
     return fov_map
 
 
+# ---------------- symmetric recursive shadowcasting -----------------
+# see https://www.albertford.com/shadowcasting/
+# unlike the ray casting above, every tile inside the torch radius is looked at only once per
+# quadrant and the result has no artifacts, so no post-processing is necessary.
+
+# (dx, dy) of a step in the "depth" and in the "column" direction for each of the 4 quadrants
+QUADRANTS = (((0, -1), (1, 0)),  # north
+             ((1, 0), (0, 1)),  # east
+             ((0, 1), (1, 0)),  # south
+             ((-1, 0), (0, 1)))  # west
+
+
+def shadowcast(origin, torch_radius, is_blocking, fov_map, offset=(0, 0)):
+    """symmetric recursive shadowcasting
+       marks every tile in fov_map (list of lists or 2d array, [y][x]) as True
+       that is visible from origin (x,y) and not farther away than torch_radius.
+
+       :param: is_blocking: function(x, y) -> True if the tile at x,y blocks the line of sight.
+               must also return True for tiles outside of the playfield
+       :param: offset: (x, y) of the tile in fov_map[0][0], if fov_map covers only a part of the playfield
+       :returns: fov_map
+    """
+    ox, oy = origin
+    mx, my = offset
+    fov_map[oy - my][ox - mx] = True
+    radius_squared = torch_radius * torch_radius
+    height, width = len(fov_map), len(fov_map[0])
+    for (ddx, ddy), (cdx, cdy) in QUADRANTS:
+
+        def scan(depth, start_num, start_den, end_num, end_den):
+            # slopes are fractions num / den (den always > 0), kept as integers to stay exact and fast
+            if depth > torch_radius:
+                return
+            prev_blocking = None  # None: no tile of this row looked at yet
+            # round_ties_up(depth * start_slope) and round_ties_down(depth * end_slope)
+            min_col = (2 * depth * start_num + start_den) // (2 * start_den)
+            max_col = -((end_den - 2 * depth * end_num) // (2 * end_den))
+            for col in range(min_col, max_col + 1):
+                x = ox + ddx * depth + cdx * col
+                y = oy + ddy * depth + cdy * col
+                blocking = is_blocking(x, y)
+                # a wall is visible as soon as any part of it is lit, a floor only if its center is lit
+                if blocking or (depth * start_num <= col * start_den and col * end_den <= depth * end_num):
+                    if depth * depth + col * col <= radius_squared and 0 <= x - mx < width and 0 <= y - my < height:
+                        fov_map[y - my][x - mx] = True
+                if prev_blocking and not blocking:
+                    start_num, start_den = 2 * col - 1, 2 * depth
+                if prev_blocking is False and blocking:
+                    scan(depth + 1, start_num, start_den, 2 * col - 1, 2 * depth)
+                prev_blocking = blocking
+            if prev_blocking is False:
+                scan(depth + 1, start_num, start_den, end_num, end_den)
+
+        scan(1, -1, 1, 1, 1)
+    return fov_map
+
+
+def make_shadowcast_fov_map(agent, sim_tiles):
+    """like make_fov_map, but with symmetric recursive shadowcasting instead of Bresenham rays.
+       the agent has self.x, self.y and self.torch_radius attribute
+    """
+    fov_map = [[False for tile in line] for line in sim_tiles]
+
+    def is_blocking(x, y):
+        if x < 0 or y < 0:
+            return True
+        try:
+            return sim_tiles[y][x].block_sight
+        except IndexError:
+            return True
+
+    return shadowcast((agent.x, agent.y), agent.torch_radius, is_blocking, fov_map)
+
+
 if __name__ == "__main__":
     print("this module is supposed to be imported from the main program")
     # points1 = get_line((0, 0), (3, 4))
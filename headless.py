@@ -0,0 +1,198 @@
+"""headless batch runner: steps the simulation as fast as the cpu allows,
+   without pygame, without a window and without the 60 fps clock of the Viewer.
+
+   usage:
+   python headless.py --episodes 10 --seekers 3 --hiders 3 --boxes 60 --output data
+
+   reproducible episodes: --seed gives episode n the seed seed + n. --record also writes replay.json
+   into every episode folder, --replay plays such an episode again with exactly the same actions:
+   python headless.py --seed 1 --record --output data
+   python headless.py --replay data/episode_00000/replay.json --output replayed
+
+   --profile FILE appends the time of each phase of a tick (see tick_profiler.py) to FILE every 10 seconds
+   and prints the slowest phases at the end
+
+   --maps plays map files (see map_loader.py) instead of the built-in maze, episode n on the map n:
+   python headless.py --episodes 1000 --maps maps --output data
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import time
+
+from simulation import Simulation
+from dataset_writer import DatasetWriter
+from model_registry import ModelRegistry
+from binary_dataset import EpisodeWriter
+from map_loader import MapCache, map_files
+
+
+REPLAY_VERSION = 1
+
+
+def run_episode(directory, width=40, height=30, boxes=None, max_turns=None, smart=False,
+                background_writer=False, data_format="csv", seed=None, record=False, replay=None, map_file=None):
+    """plays one episode until all hiders are dead or max_turns is reached.
+       writes data_hiders.csv and data_seekers.csv (or the binary episode format) into directory.
+       seed: seed of Simulation.rng for this episode
+       record: also write the seed and all actions into directory/replay.json
+       replay: list of turns (see load_replay), played instead of random or smart actions
+       map_file: play this map file instead of the built-in maze, width and height are ignored then
+
+       returns: a dict with some statistics of the episode
+    """
+    os.makedirs(directory, exist_ok=True)
+    game_map = MapCache.load(map_file) if map_file is not None else None
+    Simulation.setup(width, height, boxes, seed, game_map)
+    if record:
+        Simulation.recording = []
+    if replay is not None:
+        Simulation.replay = replay
+        max_turns = len(replay) if max_turns is None else min(max_turns, len(replay))
+    if data_format == "binary":
+        writer = EpisodeWriter(directory)
+    else:
+        writer = DatasetWriter(directory, background=background_writer)
+    with writer:
+        while not Simulation.game_over():
+            for agent in Simulation.tick(smart):
+                writer.add(agent)
+            Simulation.profiler.lap("file i/o")
+            if max_turns is not None and Simulation.turns >= max_turns:
+                break
+    if record:
+        save_replay(os.path.join(directory, "replay.json"), seed, width, height, boxes, map_file)
+    return {"turns": Simulation.turns,
+            "points_hiders": Simulation.points_hiders[-1] if Simulation.points_hiders else Simulation.num_hiders,
+            "points_seekers": Simulation.points_seekers[-1] if Simulation.points_seekers else 0,
+            }
+
+
+def save_replay(filename, seed, width, height, boxes, map_file=None):
+    """writes the settings, the seed and the actions recorded in Simulation.recording into a json file.
+       boxes is the argument of Simulation.setup: None (a random number) needs one more random number than
+       the same number of boxes given directly, so it must be replayed as None.
+       map_file is stored with the hash of its content, the replay refuses to play on a changed map
+    """
+    with open(filename, "w") as f:
+        json.dump({"version": REPLAY_VERSION, "seed": seed, "width": width, "height": height,
+                   "map": map_file, "map_digest": MapCache.load(map_file).digest if map_file is not None else None,
+                   "boxes": boxes, "seekers": Simulation.num_seekers,
+                   "hiders": Simulation.num_hiders, "fov_algorithm": Simulation.fov_algorithm,
+                   # json has no int keys: every turn is a list of [agent number, action, argument]
+                   "turns": [[[number, action, argument] for number, (action, argument) in turn.items()]
+                             for turn in Simulation.recording]}, f)
+
+
+def load_replay(filename):
+    """reads a json file written by save_replay.
+       returns: dict with the settings and the seed, "turns" is a list of {agent number: (action, argument)}
+    """
+    with open(filename) as f:
+        replay = json.load(f)
+    if replay["version"] != REPLAY_VERSION:
+        raise ValueError(f"unknown replay version {replay['version']} in {filename}")
+    replay["turns"] = [{number: (action, argument) for number, action, argument in turn}
+                       for turn in replay["turns"]]
+    return replay
+
+
+def replay_episode(filename, output, background_writer=False, data_format="csv"):
+    """plays an episode recorded with --record again, with the same seed and the same actions"""
+    replay = load_replay(filename)
+    map_file = replay.get("map")  # replays of the built-in maze have no map
+    if map_file is not None and MapCache.load(map_file).digest != replay["map_digest"]:
+        raise ValueError(f"{map_file} has changed since {filename} was recorded")
+    Simulation.num_seekers = replay["seekers"]
+    Simulation.num_hiders = replay["hiders"]
+    Simulation.fov_algorithm = replay["fov_algorithm"]
+    start = time.perf_counter()
+    result = run_episode(output, replay["width"], replay["height"], replay["boxes"], None, False,
+                         background_writer, data_format, replay["seed"], replay=replay["turns"], map_file=map_file)
+    duration = time.perf_counter() - start
+    print(f"replay of {filename}: {result['turns']} turns in {duration:.2f} seconds "
+          f"({result['turns'] / duration if duration else 0:.1f} turns/s), "
+          f"hiders: {result['points_hiders']}, seekers: {result['points_seekers']}")
+    return result
+
+
+def run(episodes, output, seekers=3, hiders=3, boxes=None, width=40, height=30, max_turns=None, smart=False,
+        fov_algorithm="raycasting", background_writer=False, data_format="csv", seed=None, record=False,
+        maps=None):
+    """plays several episodes, each episode gets its own sub-folder inside output.
+       episode n uses the seed seed + n, without a seed every episode gets a random seed.
+       maps: list of map files, episode n plays on map n (the list starts again when it is used up)
+    """
+    Simulation.num_seekers = seekers
+    Simulation.num_hiders = hiders
+    Simulation.fov_algorithm = fov_algorithm
+    stats = []
+    for episode in range(episodes):
+        start = time.perf_counter()
+        episode_seed = seed + episode if seed is not None else random.randrange(2 ** 32)
+        map_file = maps[episode % len(maps)] if maps else None
+        result = run_episode(os.path.join(output, f"episode_{episode:05d}"), width, height, boxes,
+                             max_turns, smart, background_writer, data_format, episode_seed, record,
+                             map_file=map_file)
+        duration = time.perf_counter() - start
+        print(f"episode {episode}: {result['turns']} turns in {duration:.2f} seconds "
+              f"({result['turns'] / duration if duration else 0:.1f} turns/s), "
+              f"hiders: {result['points_hiders']}, seekers: {result['points_seekers']}")
+        stats.append(result)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="run agentsnake episodes without a window")
+    parser.add_argument("--episodes", type=int, default=1, help="number of episodes to play")
+    parser.add_argument("--seekers", type=int, default=Simulation.num_seekers, help="number of seekers")
+    parser.add_argument("--hiders", type=int, default=Simulation.num_hiders, help="number of hiders")
+    parser.add_argument("--boxes", type=int, default=None,
+                        help=f"number of boxes (default: random between {Simulation.min_boxes} and {Simulation.max_boxes})")
+    parser.add_argument("--width", type=int, default=40, help="width of the playfield in cells")
+    parser.add_argument("--height", type=int, default=30, help="height of the playfield in cells")
+    parser.add_argument("--max-turns", type=int, default=10000,
+                        help="stop an episode after this many turns, 0 means no limit")
+    parser.add_argument("--smart", action="store_true", help="use the trained models instead of random actions")
+    parser.add_argument("--backend", choices=ModelRegistry.backends, default=ModelRegistry.backend,
+                        help="run the models with tensorflow or with numpy (the .npz files of numpy_model.py)")
+    parser.add_argument("--fov", choices=("raycasting", "shadowcasting"), default=Simulation.fov_algorithm,
+                        help="field of view algorithm")
+    parser.add_argument("--background-writer", action="store_true",
+                        help="write the csv files in a background thread")
+    parser.add_argument("--format", choices=("csv", "binary"), default="csv",
+                        help="csv files or the binary episode format of binary_dataset.py")
+    parser.add_argument("--seed", type=int, default=None, help="episode n uses seed + n (default: random)")
+    parser.add_argument("--record", action="store_true", help="write replay.json into every episode folder")
+    parser.add_argument("--replay", default=None,
+                        help="play the episode of this replay.json again (writes into --output)")
+    parser.add_argument("--profile", default=None, help="append the tick profiler stats to this file")
+    parser.add_argument("--maps", nargs="+", default=None,
+                        help="map files or directories of .txt map files, played one after the other")
+    parser.add_argument("--output", default="data", help="directory for the csv files")
+    parser.add_argument("--verbose", action="store_true", help="log grabs, drops and the decisions of the models (debug level)")
+    args = parser.parse_args(argv)
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+    if args.width < 3 or args.height < 3:
+        parser.error("the playfield needs at least 3 x 3 cells: a fence around the floor")
+    if args.maps is not None and not map_files(args.maps):
+        parser.error(f"no map files in {' '.join(args.maps)}")
+    Simulation.profiler.dump_file = args.profile
+    ModelRegistry.set_backend(args.backend)
+    if args.replay:
+        replay_episode(args.replay, args.output, args.background_writer, args.format)
+    else:
+        run(args.episodes, args.output, args.seekers, args.hiders, args.boxes, args.width, args.height,
+            args.max_turns or None, args.smart, args.fov, args.background_writer, args.format, args.seed,
+            args.record, map_files(args.maps) if args.maps else None)
+    if args.profile:
+        Simulation.profiler.start()  # the last turn goes into the stats, too
+        Simulation.profiler.dump()
+        print("slowest phases:", Simulation.profiler.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,983 +1,398 @@
-import pygame
-import pygame.freetype
-import random
-from matplotlib import pyplot as plt
-import numpy as np
-from sklearn.preprocessing import MinMaxScaler
-
-from tensorflow.keras.models import load_model
-
-# import fov_tools
-
-maze1 = """
-#######################
-#.....................#
-#.....................#
-#......aaa.bbb.ccc....#
-#......aaa.bbb.ccc....#
-#.....................#
-##########AAA#BBB#CCC##
-#.....................#
-#........aaa.bbb.ccc..#
-#.....................#"""
-
-
-def choose_random_place():
-    """ choose a place in the playfield that is not occupied
-        bye other boxes, agents, walls or closed doors
-
-        returns: x,y [int]
-    """
-    ok = False
-    while not ok:
-        x = random.randint(1, Viewer.width // Viewer.grid_size - 2)
-        y = random.randint(1, Viewer.height // Viewer.grid_size - 2)
-        for box in Simulation.boxes:
-            if box.x == x and box.y == y:
-                continue
-        ok = True
-        for ty, row in enumerate(Simulation.tiles):
-            for tx, element in enumerate(row):
-                if (ty == y and tx == x):
-                    if type(element) in [Wall, PressurePlate, Door, TransparentWall]:
-                        ok = False
-                        break
-    return x, y
-
-
-class Tile:
-    """parent class of a basic tile like floor, wall etc."""
-    block_sight = False
-    block_movement = False
-
-
-class Wall(Tile):
-    """outer border of playfield must be made out of walls"""
-    color = (50, 50, 50)
-    block_sight = True
-    block_movement = True
-
-
-class TransparentWall(Tile):
-    """a wall out of transparent material"""
-    color = (0, 255, 255)  # light blue
-    block_sight = False
-
-
-class Floor(Tile):
-    """allows unrestricted movement of boxes, agents etc"""
-    color = None
-
-
-class PressurePlate(Tile):
-    def __init__(self, x, y, key=1):
-        self.x = x
-        self.y = y
-        self.key = key
-        self.color = (0, 255, 0)
-
-        Simulation.pressureplates.append(self)
-
-
-class Door:
-    def __init__(self, x, y, key=1):
-        self.x = x
-        self.y = y
-        self.key = key
-        self.closed = True
-        self.coloropen = (255, 255, 255)
-        self.colorclosed = (0, 0, 0)
-        # self.color = self.colorclosed
-        Simulation.doors.append(self)
-
-    @property
-    def color(self):
-        if self.closed:
-            return self.colorclosed
-        return self.coloropen
-
-    @property
-    def block_sight(self):
-        # the door blocks the field of view (fov) only when closed
-        if self.closed:
-            return True
-        return False
-
-    @property
-    def block_movement(self):
-        if self.closed:
-            return True
-        return False
-
-
-class Box:
-    block_sight = True
-    block_movement = True
-
-    def __init__(self, x=None, y=None):
-        if x is None and y is None:
-            x, y = choose_random_place()
-        elif not all((x, y)):  # anything other than None/False/0 is considered True for all
-            raise ValueError(f"x {x} and y {y} must be both None or must both be an integer vale! ")
-        self.x = x
-        self.y = y
-
-        self.dx = 0
-        self.dy = 0
-
-        self.d = 0
-        self.friction = random.choice([32, 64, 96, 128, 160, 192, 224, 255])  # TODO: need physic for friction
-        self.color = (self.friction, self.friction, 0)
-        self.locked = False
-
-        Simulation.boxes.append(self)
-
-    def move(self):
-        if self.locked:
-            self.dx, self.dy = 0, 0
-            return
-        block_in_path = Simulation.tiles[self.y + self.dy][self.x + self.dx]
-        if block_in_path.block_movement:
-            self.dx, self.dy = 0, 0
-            return
-        for box in Simulation.boxes:
-            if box.x == self.x + self.dx and box.y == self.y + self.dy:
-                box.dx = self.dx  # TODO: impulse to other boxes need physic !
-                box.dy = self.dy  # TODO: impulse to other boxes need physic !
-                self.dx, self.dy = 0, 0
-                return
-        for agent in Simulation.agents.values():
-            if agent.x == self.x + self.dx and agent.y == self.y + self.dy:
-                self.dx, self.dy = 0, 0
-                return
-        self.x += self.dx
-        self.y += self.dy
-        if self.dx != 0 or self.dy != 0:
-            self.d += Viewer.grid_size
-            if self.d > self.friction:
-                self.dx, self.dy = 0, 0
-                self.d = 0
-
-
-class Simulation:
-    agents = {}  # {agent_number: agent instance}
-    tiles = []
-    boxes = []
-    pressureplates = []
-    doors = []
-    num_seekers = 3
-    num_hiders = 3
-    fov_map = []
-    seeker_fov_map = []
-    hider_fov_map = []
-
-
-class Agent:
-    number = 0
-
-    def __init__(self, seeker=False, x=None, y=None, hp=1):
-        self.number = Agent.number
-        Agent.number += 1
-        self.torch_radius = 5
-        self.hp = hp
-        # field of view: a list of list, matching the tiles of the simulation. each item can be True or False
-        self.fov = []
-        self.seeker = seeker
-
-        if self.seeker:
-            self.model = load_model("models/model_seekers.h5")
-        else:
-            self.model = load_model("models/model_hiders.h5")
-
-        self.rewards = {self.move: 0,
-                        self.grab: 0,
-                        self.kick: 0,
-                        self.drop: 0,
-                        self.wait: -5}
-
-        self.enemy_north = 0
-        self.enemy_east = 0
-        self.enemy_south = 0
-        self.enemy_west = 0
-
-        self.box_north = 0
-        self.box_east = 0
-        self.box_south = 0
-        self.box_west = 0
-
-        self.lastpoints = Simulation.num_hiders if not self.seeker else 0
-        self.lastdx = 0
-        self.lastdy = 0
-
-        self.grabbing_state = 0  # 0 (or False) ..... No State (can move, grab, push)
-                                 # 1 (or True) ..... Grabbed Box (can move, drop)
-
-        self.grabbed_box = None  # reference to the grabbed box instance, can also be a corpse
-
-        self.turns_alive = 0  # counter, how many turns agent was alive
-
-        if x is None and y is None:
-            x, y = choose_random_place()
-        elif not all((x, y)):  # anything other than None/False/0 is considered True for all
-            raise ValueError(f"x {x} and y {y} must be both None or must both be an integer vale! ")
-
-        self.x = x
-        self.y = y
-
-        self.dataset = []
-
-        red_min, green_min, blue_min = 0, 0, 0
-        red_max, green_max, blue_max = 255, 255, 255
-        if self.seeker is True:
-            red_min = 255
-            green_max = 50
-            blue_max = 50
-        else:
-            red_max = 50
-            green_max = 50
-            blue_min = 255
-        self.color = self.choose_random_color(red_min, red_max, green_min, green_max, blue_min, blue_max)
-
-        self.viewdirection = 0
-        self.viewrange = 5
-
-        Simulation.agents[self.number] = self
-
-    def check_for_enemies(self):
-        self.enemy_north = 0
-        self.enemy_east = 0
-        self.enemy_south = 0
-        self.enemy_west = 0
-
-        for e in [s for s in Simulation.agents.values() if s.seeker != self.seeker and s.hp > 0]:
-            distx = e.x-self.x
-            disty = e.y-self.y
-            dist = (distx**2+disty**2)**0.5
-            if dist <= self.torch_radius:
-                if e.y < self.y:
-                    self.enemy_north += self.torch_radius-(self.y-e.y)
-                if e.y > self.y:
-                    self.enemy_south += self.torch_radius-(e.y-self.y)
-                if e.x < self.x:
-                    self.enemy_west += self.torch_radius-(self.x-e.x)
-                if e.x > self.x:
-                    self.enemy_east += self.torch_radius-(e.x-self.x)
-
-    def check_for_boxes(self):
-        self.box_north = 0
-        self.box_east = 0
-        self.box_south = 0
-        self.box_west = 0
-
-        for b in [box for box in Simulation.boxes]:
-            distx = b.x-self.x
-            disty = b.y-self.y
-            dist = (distx**2+disty**2)**0.5
-            if dist <= self.torch_radius:
-                if b.y < self.y:
-                    self.box_north += 1 #self.torch_radius-(self.y-b.y)
-                if b.y > self.y:
-                    self.box_south += 1 #self.torch_radius-(b.y-self.y)
-                if b.x < self.x:
-                    self.box_west += 1 #self.torch_radius-(self.x-b.x)
-                if b.x > self.x:
-                    self.box_east += 1 #self.torch_radius-(b.x-self.x)
-
-
-    def get_objects_near_me(self):
-        """returns a list of boxes or corpses around my position"""
-        near_me = []
-        # for (dx,dy) in ((-1,-1),(0,-1),(1,-1),(-1,0),(1,0),(-1,1),(0,1),(1,1) ):
-        for (dx, dy) in ((0, -1), (-1, 0), (1, 0), (0, 1)):
-            for item in (Simulation.boxes + [body for body in Simulation.agents.values() if body.hp <= 0]):
-                if (item.x == self.x + dx) and (item.y == self.y + dy):
-                    near_me.append(item)
-        return near_me
-
-    def choose_random_color(self, red_min=0, red_max=255, green_min=0, green_max=255, blue_min=0, blue_max=255):
-        """returns a color not used by another agent or by Simulation_background_color"""
-        while True:
-            color = (
-            random.randint(red_min, red_max), random.randint(green_min, green_max), random.randint(blue_min, blue_max))
-            if color == Viewer.background_color:
-                continue
-            if color in [a.color for a in Simulation.agents.values()]:
-                continue
-            return color
-
-    def random_action(self):
-        possible_actions = [self.wait, self.move_random]
-
-        near_me = self.get_objects_near_me()
-        if near_me:  # same as : if len(get_objects_near_me()) > 0:
-            possible_actions.append(self.kick)  # grabbed box is excluded from kicking in later code
-            if not self.grabbing_state:
-                possible_actions.append(self.grab)
-        if self.grabbing_state:
-            possible_actions.append(self.drop)
-
-        action = random.choice(possible_actions)
-        action()
-
-        points = 0
-
-        self.dataset = []
-        dataset = []
-        for _ in range(10):
-            dataset.append(0)
-        if self.lastdx == 0 and self.lastdy == -1:
-            points += self.rewards[self.move]
-            dataset[0] = 1
-        if self.lastdx == 1 and self.lastdy == 0:
-            points += self.rewards[self.move]
-            dataset[1] = 1
-        if self.lastdx == 0 and self.lastdy == 1:
-            points += self.rewards[self.move]
-            dataset[2] = 1
-        if self.lastdx == -1 and self.lastdy == 0:
-            points += self.rewards[self.move]
-            dataset[3] = 1
-        if Simulation.tiles[self.y + self.lastdy][self.x + self.lastdx].block_movement:
-            points -= 1
-            dataset[8] = 1
-        dataset[9] = self.grabbing_state
-        self.lastdx, self.lastdy = 0, 0
-        if action == self.grab:
-            points += self.rewards[self.grab]
-            dataset[4] = 1
-        elif action == self.drop:
-            points += self.rewards[self.drop]
-            dataset[5] = 1
-        elif action == self.kick:
-            points += self.rewards[self.kick]
-            dataset[6] = 1
-        elif action == self.wait:
-            points += self.rewards[self.wait]
-            dataset[7] = 1
-
-        dataset.append(self.x)
-        dataset.append(self.y)
-
-        dummyfov = [[0 for tile in line] for line in Simulation.tiles]
-        for line in dummyfov:
-            linestr = ""
-            for nr in line:
-                linestr += str(nr)
-            dataset.append(int(linestr))
-
-        if self.get_objects_near_me():
-            dataset.append(1)
-        else:
-            dataset.append(0)
-
-        dataset.append(points)
-        self.dataset = dataset
-
-    def smart_action(self):
-        possible_points = []
-        self.check_for_enemies()
-        #self.check_for_boxes()
-        for _ in range(8):
-            testdata = [0,0,0,0,0,0,0,0,0,0]
-            testdata[_] = 1
-            if testdata[0] == 1:
-                if Simulation.tiles[self.y-1][self.x+0].block_movement:
-                    testdata[8] = 1
-            elif testdata[1] == 1:
-                if Simulation.tiles[self.y+0][self.x+1].block_movement:
-                    testdata[8] = 1
-            elif testdata[2] == 1:
-                if Simulation.tiles[self.y+1][self.x+0].block_movement:
-                    testdata[8] = 1
-            elif testdata[3] == 1:
-                if Simulation.tiles[self.y+0][self.x-1].block_movement:
-                    testdata[8] = 1
-            testdata[9] = self.grabbing_state
-            testdata.append(self.enemy_north)
-            testdata.append(self.enemy_east)
-            testdata.append(self.enemy_south)
-            testdata.append(self.enemy_west)
-            testdata.append(1 if self.get_objects_near_me() else 0)
-            #testdata.append(self.box_north)
-            #testdata.append(self.box_east)
-            #testdata.append(self.box_south)
-            #testdata.append(self.box_west)
-
-            p = self.model.predict(np.array([testdata]))[0][0]
-            possible_points.append(p)
-        highp_idx = possible_points.index(max(possible_points))
-        print(highp_idx)
-        dx, dy = 0, 0
-        if highp_idx == 0:
-            dy = -1
-        elif highp_idx == 1:
-            dx = 1
-        elif highp_idx == 2:
-            dy = 1
-        elif highp_idx == 3:
-            dx = -1
-        if dx != 0 or dy != 0:
-            print(f"{self.number}: move({dx},{dy})")
-            self.move(dx, dy)
-        if highp_idx == 4:
-            print(f"{self.number}: grab()")
-            self.grab()
-        elif highp_idx == 5:
-            print(f"{self.number}: drop()")
-            self.drop()
-        elif highp_idx == 6:
-            print(f"{self.number}: kick()")
-            self.kick()
-        elif highp_idx == 7:
-            print(f"{self.number}: wait()")
-            self.wait()
-
-    def wait(self):
-        pass
-
-    def drop(self):
-        self.grabbing_state = 0
-        self.grabbed_box = None
-
-    def move_random(self):
-        # directions =  ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
-        directions = ((0, -1), (-1, 0), (1, 0), (0, 1),)
-        dx, dy = random.choice(directions)
-        self.lastdx, self.lastdy = dx, dy
-        self.move(dx, dy)
-
-    def move(self, dx, dy):
-        ok = True
-        tile_in_my_path = Simulation.tiles[self.y + dy][self.x + dx]
-        if tile_in_my_path.block_movement:
-            return  # no movement
-        # run into other agents? corpses are blocking the way, like boxes
-        for other in Simulation.agents.values():
-            if other.number == self.number:
-                continue
-            if other.x == self.x + dx and other.y == self.y + dy:
-                if self.seeker and not other.seeker and other.hp > 0:
-                    other.hp = 0  # kill hider if self.seeker
-                if other.seeker and not self.seeker:
-                    self.hp = 0  # kill myself
-                return  # no movement
-
-        # box blocks movement?
-        for box in [b for b in list(Simulation.agents.values()) + Simulation.boxes if b != self.grabbed_box]:
-            if box.x == self.x + dx and box.y == self.y + dy:
-                return  # no movement
-
-        oldx, oldy = self.x, self.y
-        self.x += dx
-        self.y += dy
-        # print("moving...")
-        # print("state:", self.grabbing_state)
-        if self.grabbing_state:
-            # Box is grabbed -> Move with us
-            self.grabbed_box.x = oldx
-            self.grabbed_box.y = oldy
-            print("moved grabbing box", self.grabbed_box)
-
-    def grab(self):
-        if self.grabbing_state == 1 or not self.get_objects_near_me():
-            # already busy grabbing box or no object to grab
-            return
-        self.grabbed_box = random.choice(self.get_objects_near_me())
-        self.grabbing_state = 1
-        print("GRABBING", self.grabbed_box, self.grabbed_box.x, self.grabbed_box.y)
-
-    def drop(self):
-        if self.grabbing_state != 1:
-            # no box grabbed
-            return
-        print("dropping")
-        self.grabbing_state = 0
-        self.grabbed_box = None
-
-    def kick(self):
-        if self.grabbing_state == 1:
-            # cant kick when grabbing box
-            return
-        # directions = ((0, 1), (1, 0), (0, -1), (-1, 0))
-        near_me = [item for item in self.get_objects_near_me() if item != self.grabbed_box]
-        if near_me:
-            kicked_object = random.choice(near_me)
-            kicked_object.dx, kicked_object.dy = kicked_object.x - self.x, kicked_object.y - self.y
-
-    def make_fov_map(self, remove_artifacts=False):
-        # clear fov_map
-        self.fov_map = [[False for tile in line] for line in Simulation.tiles]
-        # self.checked = set() # clear the set of checked coordinates
-        px, py, = self.x, self.y
-        # set all tiles to False
-        # set player's tile to visible
-        self.fov_map[py][px] = True
-        # get coordinates form player to point at end of torchradius / torchsquare
-        endpoints = set()
-        for y in range(py - self.torch_radius, py + self.torch_radius + 1):
-            if y == py - self.torch_radius or y == py + self.torch_radius:
-                for x in range(px - self.torch_radius, px + self.torch_radius + 1):
-                    endpoints.add((x, y))
-            else:
-                endpoints.add((px - self.torch_radius, y))
-                endpoints.add((px + self.torch_radius, y))
-        for coordinate in endpoints:
-            # a line of points from the player position to the outer edge of the torchsquare
-            points = get_line((px, py), (coordinate[0], coordinate[1]))
-            self.calculate_fov_points(points)
-        # print(Game.fov_map)
-        # ---------- the fov map is now ready to use, but has some ugly artifacts ------------
-        # ---------- start post-processing fov map to clean up the artifacts ---
-        if not remove_artifacts:
-            return
-        # -- basic idea: divide the torch-square into 4 equal sub-squares.
-        # -- look of a invisible wall is behind (from the player perspective) a visible
-        # -- ground floor. if yes, make this wall visible as well.
-        # -- see https://sites.google.com/site/jicenospam/visibilitydetermination
-        # ------ north-west of player
-        for xstart, ystart, xstep, ystep, neighbors in [
-            (-self.torch_radius, -self.torch_radius, 1, 1, [(0, 1), (1, 0), (1, 1)]),
-            (-self.torch_radius, self.torch_radius, 1, -1, [(0, -1), (1, 0), (1, -1)]),
-            (self.torch_radius, -self.torch_radius, -1, 1, [(0, -1), (-1, 0), (-1, -1)]),
-            (self.torch_radius, self.torch_radius, -1, -1, [(0, 1), (-1, 0), (-1, 1)])]:
-
-            for x in range(px + xstart, px, xstep):
-                for y in range(py + ystart, py, ystep):
-                    # not even in fov?
-                    try:
-                        visible = self.fov_map[y][x]
-                    except IndexError:
-                        continue
-                    if visible:
-                        continue  # next, i search invisible tiles!
-                    # oh, we found an invisble tile! now let's check:
-                    # is it a wall?
-                    if not Simulation.tiles[y][x].block_sight:
-                        continue  # next, i search walls!
-                    # --ok, found an invisible wall.
-                    # check south-east neighbors
-
-                    for dx, dy in neighbors:
-                        # does neigbor even exist?
-                        try:
-                            v = self.fov_map[y + dy][x + dx]
-                            t = Simulation.tiles[y + dy][x + dx]
-                        except IndexError:
-                            continue
-                        # is neighbor a tile AND visible?
-                        if not t.block_sight and v == True:
-                            # ok, found a visible floor tile neighbor. now let's make this wall
-                            # visible as well
-                            self.fov_map[y][x] = True
-                            break  # other neighbors are irrelevant now
-
-    def calculate_fov_points(self, points):
-        """needs a points-list from Bresham's get_line method"""
-        for point in points:
-            x, y = point[0], point[1]
-            # player tile always visible
-            if x == self.x and y == self.y:
-                self.fov_map[y][x] = True  # make this tile visible and move to next point
-                continue
-            # outside of dungeon level ?
-            try:
-                tile = Simulation.tiles[y][x]
-            except:
-                continue  # outside of dungeon error
-            # outside of torch radius ?
-            distance = ((self.x - x) ** 2 + (self.y - y) ** 2) ** 0.5
-            if distance > self.torch_radius:
-                continue
-            self.fov_map[y][x] = True  # make this tile visible
-            if tile.block_sight:
-                break  # forget the rest
-            # outcomment the next lines if boxes shall NOT break line of sight
-            if len([b for b in Simulation.boxes if b.x == x and
-                                                   b.y == y]) > 0:
-                break  # forget the rest
-
-
-class Viewer:
-    width = 0
-    height = 0
-    grid_size = 20
-    grid_color = (200, 200, 200)
-    background_color = (255, 255, 255)
-    min_boxes = 60
-    max_boxes = 70
-    font = None
-
-    def __init__(self, width=800, height=600):
-
-        Viewer.width = width
-        Viewer.height = height
-
-        # ---- pygame init
-        pygame.init()
-        pygame.mixer.init(11025)  # raises exception on fail
-        # Viewer.font = pygame.font.Font(os.path.join("data", "FreeMonoBold.otf"),26)
-        # fontfile = os.path.join("data", "fonts", "DejaVuSans.ttf")
-        # --- font ----
-        # if you have your own font:
-        # Viewer.font = pygame.freetype.Font(os.path.join("data","fonts","INSERT_YOUR_FONTFILENAME.ttf"))
-        # otherwise:
-        fontname = pygame.freetype.get_default_font()
-        Viewer.font = pygame.freetype.SysFont(fontname, 64)
-
-        # ------ joysticks init ----
-        # pygame.joystick.init()
-        # self.joysticks = [
-        #    pygame.joystick.Joystick(x) for x in range(pygame.joystick.get_count())
-        # ]
-        # for j in self.joysticks:
-        #    j.init()
-        self.screen = pygame.display.set_mode(
-            (self.width, self.height), pygame.DOUBLEBUF
-        )
-        self.clock = pygame.time.Clock()
-        self.fps = 60
-        self.playtime = 0.0
-
-        # ------ background images ------
-        # self.backgroundfilenames = []  # every .jpg or .jpeg file in the folder 'data'
-        # self.make_background()
-        # self.load_images()
-
-        # self.prepare_sprites()
-        self.setup()
-        self.run()
-
-    def setup(self):
-        """call this to restart a game"""
-        self.background = pygame.Surface((Viewer.width, Viewer.height))
-        self.background.fill(Viewer.background_color)
-
-        self.draw_grid()
-        self.darkblock = pygame.Surface((Viewer.grid_size, Viewer.grid_size))
-        self.darkblock.fill((0, 0, 0))  # fill black
-        self.darkblock.set_alpha(128)
-        self.darkblock.convert_alpha()
-        self.lightblock = pygame.Surface((Viewer.grid_size, Viewer.grid_size))
-        self.lightblock.fill((0, 0, 0))  # fill black
-        self.lightblock.set_alpha(32)
-        self.lightblock.convert_alpha()
-
-        # create fence
-        for y in range(Viewer.height // Viewer.grid_size):
-            if y == 0 or y == Viewer.height // Viewer.grid_size - 1:
-                row = []
-                for _ in range(Viewer.width // Viewer.grid_size):
-                    row.append(Wall())
-                Simulation.tiles.append(row)
-                continue
-            row = [Wall()]
-            for x in range(Viewer.width // Viewer.grid_size - 2):
-                row.append(Floor())
-            row.append(Wall())
-            Simulation.tiles.append(row)
-
-        # create maze (walls/floors)
-        for y, line in enumerate(maze1.strip().split("\n")):
-            for x, char in enumerate(line):
-                if char == "#":
-                    Simulation.tiles[y][x] = Wall()
-                elif char == ".":
-                    Simulation.tiles[y][x] = Floor()
-                elif char == "a":
-                    Simulation.tiles[y][x] = PressurePlate(key=1, x=x, y=y)
-                elif char == "b":
-                    Simulation.tiles[y][x] = PressurePlate(key=2, x=x, y=y)
-                elif char == "c":
-                    Simulation.tiles[y][x] = PressurePlate(key=3, x=x, y=y)
-                elif char == "d":
-                    Simulation.tiles[y][x] = PressurePlate(key=4, x=x, y=y)
-                elif char == "A":
-                    Simulation.tiles[y][x] = Door(key=1, x=x, y=y)
-                elif char == "B":
-                    Simulation.tiles[y][x] = Door(key=2, x=x, y=y)
-                elif char == "C":
-                    Simulation.tiles[y][x] = Door(key=3, x=x, y=y)
-                elif char == "D":
-                    Simulation.tiles[y][x] = Door(key=4, x=x, y=y)
-
-        # initialize Field of View for all agents
-        # for agent in Simulation.agents.values():
-        #    agent.fov = [[False for tile in line] for line in Simulation.tiles]
-
-        for b in range(random.randint(Viewer.min_boxes, Viewer.max_boxes)):
-            Box()
-        self.draw_maze()
-
-        for _ in range(Simulation.num_seekers):
-            Agent(seeker=True)
-        for _ in range(Simulation.num_hiders):
-            Agent(seeker=False)
-
-        header = "GoNorth,GoEast,GoSouth,GoWest,Grab,Drop,Kick,Wait,RunAgainstWall,GrabbedSMTH,PosX,PosY,"
-        for l in range(len(Simulation.tiles)):
-            header += "fov" + str(l) + ","
-        header += "BoxNextToMe,Points\n"
-        with open("data_hiders.csv", "w") as f:
-            f.write(header)
-        with open("data_seekers.csv", "w") as f:
-            f.write(header)
-
-    def draw_grid(self):
-        # draw grid x
-        for x in range(0, Viewer.width, Viewer.grid_size):
-            pygame.draw.line(self.background, self.grid_color, (x, 0), (x, Viewer.height), 1)
-
-        # draw grid y
-        for y in range(0, Viewer.height, Viewer.grid_size):
-            pygame.draw.line(self.background, self.grid_color, (0, y), (Viewer.width, y), 1)
-
-    def draw_maze(self):
-        for y, line in enumerate(Simulation.tiles):
-            for x, char in enumerate(line):
-                if char.color is not None:
-                    pygame.draw.rect(self.background, char.color,
-                                     (x * Viewer.grid_size, y * Viewer.grid_size, Viewer.grid_size, Viewer.grid_size))
-
-    def convert_fovmap_to_dataset(self, fovmap, agent):
-        # Team Map
-        """Dataset Legend:
-        0 ... not visible
-        !=0 ... visible
-        2 ... Wall/Closed Door
-        3 ... Box
-        5 ... Teammate
-        6 ... Enemy
-        4 ... Pressure Plate
-        1 ... Empty Floor/Open Door
-        """
-        listofintvals = []
-        for y, line in enumerate(fovmap):
-            linestr = ""
-            for x, nr in enumerate(line):
-                if nr == 1:
-                    if type(Simulation.tiles[y][x]) == Wall or (type(Simulation.tiles[y][x]) == Door and Simulation.tiles[y][x].closed):
-                        linestr += "2"
-                    elif len([b for b in Simulation.boxes if (b.x == x and b.y == y)]) > 0:
-                        linestr += "3"
-                    elif len([a for a in Simulation.agents.values() if (a.x == x and a.y == y and a.seeker)]) > 0:
-                        if agent.seeker:
-                            linestr += "5"
-                        else:
-                            linestr += "6"
-                    elif len([a for a in Simulation.agents.values() if (a.x == x and a.y == y and not a.seeker)]) > 0:
-                        if agent.seeker:
-                            linestr += "6"
-                        else:
-                            linestr += "5"
-                    elif type(Simulation.tiles[y][x]) == PressurePlate:
-                        linestr += "4"
-                    elif type(Simulation.tiles[y][x]) == Floor or (type(Simulation.tiles[y][x]) == Door and not Simulation.tiles[y][x].closed):
-                        linestr += "1"
-                    else:
-                        linestr += "0"
-                else:
-                    linestr += "0"
-            listofintvals.append(int(linestr))
-
-
-        return listofintvals
-
-    def run(self):
-        """The mainloop"""
-        running = True
-
-        points_seekers = []
-        points_hiders = []
-
-        # --------------------------- main loop --------------------------
-        while running:
-            for a in Simulation.agents.values():
-                if a.hp > 0:
-                    a.random_action()
-                    #a.smart_action()
-                    a.turns_alive += 1
-            for b in Simulation.boxes:
-                b.move()
-            # ---pressureplates---
-            # --- generally, all doors are closed ---
-            for door in Simulation.doors:
-                door.closed = True
-                # but, when one of it's connected pressure_plates is triggered (by box or agent), the door is open
-                for pressure_plate in [pp for pp in Simulation.pressureplates if pp.key == door.key]:
-                    for item in list(Simulation.agents.values()) + Simulation.boxes:
-                        if item.x == pressure_plate.x and item.y == pressure_plate.y:
-                            door.closed = False
-                            break
-                    if not door.closed:
-                        break
-            # update field of view for each agent
-            for a in Simulation.agents.values():
-                if a.hp > 0:
-                    a.make_fov_map()
-
-            # update global fov map, make everything dark
-            Simulation.fov_map = [[False for tile in line] for line in Simulation.tiles]
-            Simulation.seeker_fov_map = [[False for tile in line] for line in Simulation.tiles]
-            Simulation.hider_fov_map = [[False for tile in line] for line in Simulation.tiles]
-            # update indivdiual fov map for each agent, make global map light
-            for agent in [a for a in Simulation.agents.values() if a.hp > 0]:
-                for y, line in enumerate(agent.fov_map):
-                    for x, tile in enumerate(line):
-                        if agent.fov_map[y][x]:
-                            Simulation.fov_map[y][x] = True
-                            if agent.seeker:
-                                Simulation.seeker_fov_map[y][x] = True
-                            else:
-                                Simulation.hider_fov_map[y][x] = True
-
-                # every agent has empty dummy dataset (zeros)
-                intlist = self.convert_fovmap_to_dataset(Simulation.seeker_fov_map if agent.seeker else Simulation.hider_fov_map, agent)
-                for i,val in enumerate(intlist):
-                    agent.dataset[12+i] = val
-                with open("data_hiders.csv" if not agent.seeker else "data_seekers.csv", "a") as f:
-                    fstr = ""
-                    for d in agent.dataset:
-                        fstr += str(d)
-                        fstr += ","
-                    fstr = fstr[:-1]
-                    f.write(fstr + "\n")
-
-            # ------- update viewer ---------
-
-            milliseconds = self.clock.tick(self.fps)  #
-            seconds = milliseconds / 1000
-            self.playtime += seconds
-            # -------- events ------
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                # ------- pressed and released key ------
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_q or event.key == pygame.K_ESCAPE:
-                        running = False
-
-            # ------------ pressed keys ------
-            pressed_keys = pygame.key.get_pressed()
-
-            # ------ mouse handler ------
-            left, middle, right = pygame.mouse.get_pressed()
-
-            oldleft, oldmiddle, oldright = left, middle, right
-            # ----------- collision detection ------------
-
-            # ---------- clear all --------------
-            points_hiders.append(len([h for h in Simulation.agents.values() if not h.seeker and h.hp > 0]))
-            points_seekers.append(Simulation.num_hiders-len([h for h in Simulation.agents.values() if not h.seeker and h.hp > 0]))
-            #pygame.display.set_caption(f"FPS: {self.clock.get_fps():.2f} | Turns-Alive: {str(turns_alive)}")  # str(nesw))
-            pygame.display.set_caption(f"FPS: {self.clock.get_fps():.2f}")
-            if not any([h.hp for h in Simulation.agents.values() if not h.seeker]):
-                print("Gameover!")
-                print(points_hiders)
-                print(points_seekers)
-                plt.plot(points_hiders)
-                plt.show()
-                plt.plot(points_seekers)
-                plt.show()
-                break
-            self.screen.blit(self.background, (0, 0))
-
-            # --------- update all sprites ----------------
-            for agent in Simulation.agents.values():
-                pygame.draw.rect(self.screen, agent.color, (
-                    agent.x * Viewer.grid_size, agent.y * Viewer.grid_size, Viewer.grid_size, Viewer.grid_size))
-            for box in Simulation.boxes:
-                pygame.draw.rect(self.screen, box.color, (
-                    box.x * Viewer.grid_size, box.y * Viewer.grid_size, Viewer.grid_size, Viewer.grid_size))
-            for door in Simulation.doors:
-                pygame.draw.rect(self.screen, door.color, (
-                    door.x * Viewer.grid_size, door.y * Viewer.grid_size, Viewer.grid_size, Viewer.grid_size))
-
-            # ----------- half-transparent FOV overlay ------------------
-            for y, line in enumerate(Simulation.tiles):
-                for x, tile in enumerate(line):
-                    if Simulation.fov_map[y][x]:
-                        self.screen.blit(self.lightblock, (x * Viewer.grid_size, y * Viewer.grid_size))
-                    else:
-                        self.screen.blit(self.darkblock, (x * Viewer.grid_size, y * Viewer.grid_size))
-
-            # self.allgroup.update(seconds)
-            # print([door.closed for door in Simulation.doors])
-            # print([(pp.x,pp.y) for pp in Simulation.pressureplates])
-            # ---------- blit all sprites --------------
-            # self.allgroup.draw(self.screen)
-            pygame.display.flip()
-            # -----------------------------------------------------
-        pygame.mouse.set_visible(True)
-        pygame.quit()
-        # try:
-        #    sys.exit()
-        # finally:
-        #    pygame.quit()
-
-
-def get_line(start, end):
-    """Bresenham's Line Algorithm
-       Produces a list of tuples from start and end
-       source: http://www.roguebasin.com/index.php?title=Bresenham%27s_Line_Algorithm#Python
-       see also: https://en.wikipedia.org/wiki/Bresenham%27s_line_algorithm
-
-       :param: start_point (x,y)
-       :param: end_point (x,y)
-       :returns: list_of_points
-       #>>> points1 = get_line((0, 0), (3, 4))
-       # >>> points2 = get_line((3, 4), (0, 0))
-       #>>> assert(set(points1) == set(points2))
-       #>>> print points1
-       #[(0, 0), (1, 1), (1, 2), (2, 3), (3, 4)]
-       #>>> print points2
-       #[(3, 4), (2, 3), (1, 2), (1, 1), (0, 0)]
-    """
-    # Setup initial conditions
-    x1, y1 = start
-    x2, y2 = end
-    dx = x2 - x1
-    dy = y2 - y1
-
-    # Determine how steep the line is
-    is_steep = abs(dy) > abs(dx)
-
-    # Rotate line
-    if is_steep:
-        x1, y1 = y1, x1
-        x2, y2 = y2, x2
-
-    # Swap start and end points if necessary and store swap state
-    swapped = False
-    if x1 > x2:
-        x1, x2 = x2, x1
-        y1, y2 = y2, y1
-        swapped = True
-
-    # Recalculate differentials
-    dx = x2 - x1
-    dy = y2 - y1
-
-    # Calculate error
-    error = int(dx / 2.0)
-    ystep = 1 if y1 < y2 else -1
-
-    # Iterate over bounding box generating points between start and end
-    y = y1
-    points = []
-    for x in range(x1, x2 + 1):
-        coord = (y, x) if is_steep else (x, y)
-        points.append(coord)
-        error -= abs(dy)
-        if error < 0:
-            y += ystep
-            error += dx
-
-    # Reverse the list if the coordinates were swapped
-    if swapped:
-        points.reverse()
-    return points
-
-
-if __name__ == "__main__":
-    viewer = Viewer()
-    viewer.run()
+import argparse
+import collections
+import logging
+import threading
+import time
+
+import numpy as np
+import pygame
+import pygame.freetype
+
+from simulation import Simulation, TILE_CLASSES, DOOR
+from dataset_writer import DatasetWriter
+from map_loader import MapCache
+from snapshot import SnapshotBuffer, take_snapshot
+from tick_profiler import TickProfiler
+
+
+class Viewer:
+    width = 0
+    height = 0
+    grid_size = 20
+    grid_color = (200, 200, 200)
+    background_color = Simulation.background_color
+    fog_alpha_visible = 32  # alpha of the black fov overlay over visible cells
+    fog_alpha_dark = 128  # ... and over cells no agent can see
+    show_profile = False  # show the slowest phases of the tick profiler in the caption, toggle with p
+    font = None
+    world_width = 0  # size of the playfield in cells, can be much larger than the window
+    world_height = 0
+    chunk_size = 32  # the background is drawn in squares of chunk_size x chunk_size cells ...
+    max_chunks = 256  # ... and this many of them are kept
+    scroll_speed = 1  # cells per frame when the camera is moved with the arrow keys
+    # cells around the camera in a snapshot: the camera moves while the snapshot is made, the part of the
+    # snapshot in view is drawn. covers scroll_speed cells per frame over the longest frame skip
+    snapshot_margin = 8
+    tick_rate = 60  # turns per second of the simulation thread ...
+    turbo = False  # ... or as many as possible, toggle with t
+    frame_skips = (0, 1, 3, 7)  # f switches to the next one: only every (frame skip + 1)th frame is drawn
+    frame_skip = 0
+
+    def __init__(self, width=800, height=600, profile_file=None, world_width=None, world_height=None, map_file=None):
+        """profile_file: append the tick profiler stats (see tick_profiler.py) to this file every 10 seconds
+           world_width, world_height: size of the playfield in cells (default: as many cells as fit in the window).
+           a larger playfield is scrolled with the arrow keys
+           map_file: play this map (see map_loader.py) instead of the built-in maze, it also sets the world size
+        """
+
+        Viewer.width = width
+        Viewer.height = height
+        Viewer.world_width = world_width if world_width is not None else width // Viewer.grid_size
+        Viewer.world_height = world_height if world_height is not None else height // Viewer.grid_size
+        self.game_map = MapCache.load(map_file) if map_file is not None else None
+        Simulation.profiler.dump_file = profile_file
+        self.profiler = TickProfiler()  # the phases of a frame, Simulation.profiler has those of a tick
+
+        # ---- pygame init
+        pygame.init()
+        pygame.mixer.init(11025)  # raises exception on fail
+        # Viewer.font = pygame.font.Font(os.path.join("data", "FreeMonoBold.otf"),26)
+        # fontfile = os.path.join("data", "fonts", "DejaVuSans.ttf")
+        # --- font ----
+        # if you have your own font:
+        # Viewer.font = pygame.freetype.Font(os.path.join("data","fonts","INSERT_YOUR_FONTFILENAME.ttf"))
+        # otherwise:
+        fontname = pygame.freetype.get_default_font()
+        Viewer.font = pygame.freetype.SysFont(fontname, 64)
+
+        # ------ joysticks init ----
+        # pygame.joystick.init()
+        # self.joysticks = [
+        #    pygame.joystick.Joystick(x) for x in range(pygame.joystick.get_count())
+        # ]
+        # for j in self.joysticks:
+        #    j.init()
+        self.screen = pygame.display.set_mode(
+            (self.width, self.height), pygame.DOUBLEBUF
+        )
+        self.clock = pygame.time.Clock()
+        self.fps = 60
+        self.playtime = 0.0
+
+        # ------ background images ------
+        # self.backgroundfilenames = []  # every .jpg or .jpeg file in the folder 'data'
+        # self.make_background()
+        # self.load_images()
+
+        # self.prepare_sprites()
+        self.setup()
+        self.run()
+
+    def setup(self):
+        """call this to restart a game"""
+        self.background = pygame.Surface((Viewer.width, Viewer.height))
+        # the half-transparent fov overlay for the whole window, see update_fog
+        self.fog = pygame.Surface((Viewer.width, Viewer.height), pygame.SRCALPHA)
+        self.fog.fill((0, 0, 0, 0))  # fill black, fully transparent
+        self.drawn_fov_map = None  # Simulation.fov_map of the last frame, None: redraw everything
+        self.drawn_colors = {}  # {(x, y): color of the agent, box or door drawn there in the last frame}
+
+        Simulation.setup(Viewer.world_width, Viewer.world_height, game_map=self.game_map)
+        # the camera shows the cells camera_x ... camera_x + view_width - 1 (and the same for y)
+        self.view_width = min(Viewer.width // Viewer.grid_size, Simulation.width)
+        self.view_height = min(Viewer.height // Viewer.grid_size, Simulation.height)
+        self.camera_x, self.camera_y = 0, 0
+        self.chunks = collections.OrderedDict()  # {(chunk x, chunk y): surface}, the least recently used first
+        self.compose_background()
+
+        self.writer = DatasetWriter()
+
+    def draw_grid(self, surface):
+        width, height = surface.get_size()
+        # draw grid x
+        for x in range(0, width, Viewer.grid_size):
+            pygame.draw.line(surface, self.grid_color, (x, 0), (x, height), 1)
+
+        # draw grid y
+        for y in range(0, height, Viewer.grid_size):
+            pygame.draw.line(surface, self.grid_color, (0, y), (width, y), 1)
+
+    def draw_maze(self, surface, tile_types):
+        """draws the tiles of tile_types (a part of Simulation.tile_types) on surface"""
+        for y, line in enumerate(tile_types):
+            for x, code in enumerate(line):
+                if code == DOOR:
+                    continue  # doors open and close, they are drawn every frame
+                color = TILE_CLASSES[code].color
+                if color is not None:
+                    pygame.draw.rect(surface, color,
+                                     (x * Viewer.grid_size, y * Viewer.grid_size, Viewer.grid_size, Viewer.grid_size))
+
+    def background_chunk(self, cx, cy):
+        """the grid and the tiles of one chunk, drawn once and then taken from self.chunks"""
+        if (cx, cy) in self.chunks:
+            self.chunks.move_to_end((cx, cy))
+            return self.chunks[(cx, cy)]
+        x0, y0 = cx * Viewer.chunk_size, cy * Viewer.chunk_size
+        tile_types = Simulation.tile_types[y0:y0 + Viewer.chunk_size, x0:x0 + Viewer.chunk_size]
+        surface = pygame.Surface((tile_types.shape[1] * Viewer.grid_size, tile_types.shape[0] * Viewer.grid_size))
+        surface.fill(Viewer.background_color)
+        self.draw_grid(surface)
+        self.draw_maze(surface, tile_types)
+        self.chunks[(cx, cy)] = surface
+        if len(self.chunks) > Viewer.max_chunks:
+            self.chunks.popitem(last=False)
+        return surface
+
+    def compose_background(self):
+        """puts the chunks in view of the camera together in self.background, the next frame redraws everything"""
+        self.background.fill(Viewer.background_color)
+        first_cx, first_cy = self.camera_x // Viewer.chunk_size, self.camera_y // Viewer.chunk_size
+        last_cx = (self.camera_x + self.view_width - 1) // Viewer.chunk_size
+        last_cy = (self.camera_y + self.view_height - 1) // Viewer.chunk_size
+        for cy in range(first_cy, last_cy + 1):
+            for cx in range(first_cx, last_cx + 1):
+                self.background.blit(self.background_chunk(cx, cy),
+                                     ((cx * Viewer.chunk_size - self.camera_x) * Viewer.grid_size,
+                                      (cy * Viewer.chunk_size - self.camera_y) * Viewer.grid_size))
+        self.drawn_fov_map = None
+
+    def camera_rect(self):
+        """(x0, y0, x1, y1): the cells x0 <= x < x1, y0 <= y < y1 are in view"""
+        return (self.camera_x, self.camera_y,
+                self.camera_x + self.view_width, self.camera_y + self.view_height)
+
+    def snapshot_rect(self):
+        """the camera rect with snapshot_margin cells around it, but not beyond the edges of the playfield"""
+        x0, y0, x1, y1 = self.camera_rect()
+        margin = Viewer.snapshot_margin
+        return (max(0, x0 - margin), max(0, y0 - margin),
+                min(Simulation.width, x1 + margin), min(Simulation.height, y1 + margin))
+
+    def move_camera(self, dx, dy):
+        """scrolls by dx, dy cells, but not beyond the edges of the playfield"""
+        x = min(max(0, self.camera_x + dx), Simulation.width - self.view_width)
+        y = min(max(0, self.camera_y + dy), Simulation.height - self.view_height)
+        if (x, y) != (self.camera_x, self.camera_y):
+            self.camera_x, self.camera_y = x, y
+            self.compose_background()
+
+    def update_fog(self, fov_map):
+        """paints the fov overlay for all cells at once: dark where no agent can see, light elsewhere"""
+        alpha_of_cells = np.where(fov_map, Viewer.fog_alpha_visible, Viewer.fog_alpha_dark).astype(np.uint8)
+        # surfarray is indexed [x, y] and in pixels, so transpose and blow up every cell to grid_size pixels
+        alpha_of_pixels = alpha_of_cells.T.repeat(Viewer.grid_size, axis=0).repeat(Viewer.grid_size, axis=1)
+        alpha = pygame.surfarray.pixels_alpha(self.fog)
+        alpha[:alpha_of_pixels.shape[0], :alpha_of_pixels.shape[1]] = alpha_of_pixels
+        del alpha  # unlocks the surface
+
+    def view_of(self, snapshot):
+        """colors and fov map of the cells in view of the camera, cut out of a snapshot.
+           cells in view but outside the snapshot (the camera moved further than the margin) are empty and dark
+        """
+        x0, y0, x1, y1 = self.camera_rect()
+        sx0, sy0, sx1, sy1 = snapshot.rect
+        if (sx0, sy0, sx1, sy1) == (x0, y0, x1, y1):
+            return snapshot.colors, snapshot.fov_map
+        colors = {(x, y): color for (x, y), color in snapshot.colors.items() if x0 <= x < x1 and y0 <= y < y1}
+        fov_map = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+        ix0, iy0, ix1, iy1 = max(x0, sx0), max(y0, sy0), min(x1, sx1), min(y1, sy1)
+        if ix0 < ix1 and iy0 < iy1:
+            fov_map[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] = snapshot.fov_map[iy0 - sy0:iy1 - sy0, ix0 - sx0:ix1 - sx0]
+        return colors, fov_map
+
+    def draw(self, snapshot):
+        """draws agents, boxes, doors and the fov overlay of a snapshot (see snapshot.py) of the cells in view.
+           only the cells that look different than in the last drawn snapshot are drawn and updated on the screen
+        """
+        x0, y0, x1, y1 = self.camera_rect()
+        colors, fov_map = self.view_of(snapshot)
+        if self.drawn_fov_map is None or self.drawn_fov_map.shape != fov_map.shape:
+            # ----- first frame or the camera moved: draw everything -----
+            self.update_fog(fov_map)
+            self.screen.blit(self.background, (0, 0))
+            for (x, y), color in colors.items():
+                pygame.draw.rect(self.screen, color, ((x - x0) * Viewer.grid_size, (y - y0) * Viewer.grid_size,
+                                                      Viewer.grid_size, Viewer.grid_size))
+            self.screen.blit(self.fog, (0, 0))
+            pygame.display.flip()
+        else:
+            # ----- dirty cells: something moved, changed color or the visibility changed -----
+            dirty = {xy for xy, color in colors.items() if self.drawn_colors.get(xy) != color}
+            dirty.update(xy for xy in self.drawn_colors if xy not in colors)
+            changed_y, changed_x = np.nonzero(fov_map != self.drawn_fov_map)
+            if len(changed_x):
+                self.update_fog(fov_map)
+                dirty.update(zip((changed_x + x0).tolist(), (changed_y + y0).tolist()))
+            rects = []
+            for x, y in dirty:
+                rect = pygame.Rect((x - x0) * Viewer.grid_size, (y - y0) * Viewer.grid_size,
+                                   Viewer.grid_size, Viewer.grid_size)
+                self.screen.blit(self.background, rect, rect)
+                if (x, y) in colors:
+                    pygame.draw.rect(self.screen, colors[(x, y)], rect)
+                self.screen.blit(self.fog, rect, rect)
+                rects.append(rect)
+            pygame.display.update(rects)
+        self.drawn_colors = colors
+        self.drawn_fov_map = fov_map  # never changed later: snapshots are read-only, view_of makes a new array
+
+    def simulate(self):
+        """the simulation thread: plays the turns at tick_rate (or in turbo as fast as possible), writes the
+           dataset rows and makes the snapshots the main loop asks for. stops at game over or when self.stop is set
+        """
+        rect = self.snapshot_rect()
+        next_tick = time.perf_counter()
+        try:
+            while not self.stop.is_set():
+                for agent in Simulation.tick():
+                    self.writer.add(agent)
+                Simulation.profiler.lap("file i/o")
+                wanted = self.snapshots.take_request()
+                game_over = Simulation.game_over()
+                if wanted is not None or game_over:
+                    rect = wanted or rect
+                    self.snapshots.publish(take_snapshot(rect))
+                    Simulation.profiler.lap("snapshot")
+                if game_over:
+                    return
+                if not Viewer.turbo:
+                    # a turn that took too long is not made up for by shorter waits later
+                    next_tick = max(next_tick + 1 / Viewer.tick_rate, time.perf_counter())
+                    self.stop.wait(max(0.0, next_tick - time.perf_counter()))
+                    Simulation.profiler.lap("idle")
+        except Exception as error:  # raised again in run
+            self.error = error
+
+    def run(self):
+        """The mainloop: draws what the simulation thread (see simulate) hands over, at up to fps frames per
+           second. the simulation has its own speed: tick_rate turns per second, or as fast as possible in turbo
+        """
+        running = True
+        self.stop = threading.Event()
+        self.error = None  # exception of the simulation thread
+        self.snapshots = SnapshotBuffer()
+        self.snapshots.request(self.snapshot_rect())
+        thread = threading.Thread(target=self.simulate, name="simulation", daemon=True)
+        thread.start()
+        drawn = None  # the last snapshot that was drawn
+        frame = 0
+        rate_time, rate_turns, turns_per_second = time.perf_counter(), 0, 0.0
+
+        # --------------------------- main loop --------------------------
+        while running:
+            self.profiler.start()
+
+            # ------- update viewer ---------
+
+            milliseconds = self.clock.tick(self.fps)  #
+            self.profiler.lap("idle")
+            seconds = milliseconds / 1000
+            self.playtime += seconds
+            # -------- events ------
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                # ------- pressed and released key ------
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_q or event.key == pygame.K_ESCAPE:
+                        running = False
+                    elif event.key == pygame.K_p:
+                        Viewer.show_profile = not Viewer.show_profile
+                    elif event.key == pygame.K_t:
+                        Viewer.turbo = not Viewer.turbo
+                    elif event.key == pygame.K_f:
+                        Viewer.frame_skip = Viewer.frame_skips[
+                            (Viewer.frame_skips.index(Viewer.frame_skip) + 1) % len(Viewer.frame_skips)]
+
+            # ------------ pressed keys ------
+            pressed_keys = pygame.key.get_pressed()
+            self.move_camera((pressed_keys[pygame.K_RIGHT] - pressed_keys[pygame.K_LEFT]) * Viewer.scroll_speed,
+                             (pressed_keys[pygame.K_DOWN] - pressed_keys[pygame.K_UP]) * Viewer.scroll_speed)
+
+            # ------ mouse handler ------
+            left, middle, right = pygame.mouse.get_pressed()
+
+            oldleft, oldmiddle, oldright = left, middle, right
+            # ----------- collision detection ------------
+
+            # ---------- clear all --------------
+            #pygame.display.set_caption(f"FPS: {self.clock.get_fps():.2f} | Turns-Alive: {str(turns_alive)}")  # str(nesw))
+            now = time.perf_counter()
+            if now - rate_time >= 1.0:
+                turns = Simulation.turns
+                turns_per_second = (turns - rate_turns) / (now - rate_time)
+                rate_time, rate_turns = now, turns
+            caption = f"FPS: {self.clock.get_fps():.2f} | turns/s: {turns_per_second:.0f}"
+            if Viewer.turbo:
+                caption += " | turbo"
+            if Viewer.frame_skip:
+                caption += f" | frame skip {Viewer.frame_skip}"
+            if Viewer.show_profile:
+                caption += " | tick: " + Simulation.profiler.summary() + " | frame: " + self.profiler.summary()
+            pygame.display.set_caption(caption)
+            self.profiler.lap("events")
+            if self.error is not None:
+                break
+
+            # --------- draw the newest snapshot and ask for the next one ----------------
+            frame += 1
+            snapshot = self.snapshots.latest()
+            if snapshot is not None and snapshot is not drawn and (
+                    frame % (Viewer.frame_skip + 1) == 0 or snapshot.game_over):
+                self.draw(snapshot)
+                drawn = snapshot
+                self.snapshots.request(self.snapshot_rect())
+                self.profiler.lap("render")
+
+            if drawn is not None and drawn.game_over:
+                thread.join()
+                from matplotlib import pyplot as plt  # slow import, only needed here
+                print("Gameover!")
+                print(Simulation.points_hiders)
+                print(Simulation.points_seekers)
+                plt.plot(Simulation.points_hiders)
+                plt.show()
+                plt.plot(Simulation.points_seekers)
+                plt.show()
+                break
+
+            # self.allgroup.update(seconds)
+            # print([door.closed for door in Simulation.doors])
+            # print([(pp.x,pp.y) for pp in Simulation.pressureplates])
+            # ---------- blit all sprites --------------
+            # self.allgroup.draw(self.screen)
+            # -----------------------------------------------------
+        self.stop.set()
+        thread.join()
+        self.writer.close()
+        pygame.mouse.set_visible(True)
+        pygame.quit()
+        if self.error is not None:
+            raise self.error
+        # try:
+        #    sys.exit()
+        # finally:
+        #    pygame.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="watch the simulation, scroll with the arrow keys, "
+                                                 "t: turbo, f: frame skip, p: profile")
+    parser.add_argument("--world-width", type=int, default=None, help="width of the playfield in cells")
+    parser.add_argument("--world-height", type=int, default=None, help="height of the playfield in cells")
+    parser.add_argument("--map", default=None, help="map file to play instead of the built-in maze")
+    parser.add_argument("--tick-rate", type=float, default=Viewer.tick_rate,
+                        help="turns per second, independent of the frames per second")
+    parser.add_argument("--turbo", action="store_true", help="start in turbo mode: as many turns as possible")
+    parser.add_argument("--verbose", action="store_true", help="log grabs, drops and the decisions of the models (debug level)")
+    parser.add_argument("--no-datasets", action="store_true",
+                        help="do not write data_*.csv (a row encodes the whole playfield, too slow for large ones)")
+    args = parser.parse_args()
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+    Simulation.datasets = not args.no_datasets
+    Viewer.tick_rate = args.tick_rate
+    Viewer.turbo = args.turbo
+    viewer = Viewer(world_width=args.world_width, world_height=args.world_height, map_file=args.map)
+    viewer.run()
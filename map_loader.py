@@ -0,0 +1,149 @@
+"""maps from text files, compiled once into a small binary form and cached on disk
+
+   a map file uses the characters of simulation.maze1: # wall, . floor, a b c d pressure plates and
+   A B C D the doors that open when a plate with the same letter is pressed. the playfield is as wide
+   as the longest line and as high as the number of lines, its border is always a wall.
+
+   compiling a map means: parse the text into the tile type grid, the tables of the pressure plates and
+   doors and the list of cells where boxes and agents can spawn. the result is written to
+   MapCache.cache_dir/<hash of the text>.map, every later load of the same text only reads that file.
+   inside one process a map is compiled or read only once, after that MapCache.load takes a few microseconds:
+
+   game_map = MapCache.load("maps/maze1.txt")
+   Simulation.setup(boxes=60, game_map=game_map)
+
+   the binary format (all numbers little-endian):
+       header       MAGIC, FORMAT_VERSION (uint16), width, height, plates, doors, spawn cells (5 x uint32)
+       tile_types   uint8, height x width
+       plates       int32, plates x 3 (x, y, key)
+       doors        int32, doors x 3 (x, y, key)
+       spawn cells  int64, y * width + x of every floor cell
+"""
+import hashlib
+import os
+import struct
+
+import numpy as np
+
+from simulation import make_tile_types, FLOOR, WALL
+
+MAGIC = b"ASMP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sH5I")
+
+
+class CompiledMap:
+    """a map ready for Simulation.setup. the arrays are read-only, all episodes on this map share them"""
+
+    def __init__(self, tile_types, plates, doors, spawn_cells, digest):
+        self.tile_types = tile_types  # uint8 array [y, x] of tile type codes
+        self.plates = plates  # int32 array [plate, (x, y, key)]
+        self.doors = doors  # int32 array [door, (x, y, key)]
+        self.spawn_cells = spawn_cells  # int64 array of y * width + x of all floor cells
+        self.digest = digest  # hash of the map text, the name of the cache file
+        for array in (tile_types, plates, doors, spawn_cells):
+            array.flags.writeable = False
+
+    @property
+    def height(self):
+        return self.tile_types.shape[0]
+
+    @property
+    def width(self):
+        return self.tile_types.shape[1]
+
+    def to_bytes(self):
+        return (HEADER.pack(MAGIC, FORMAT_VERSION, self.width, self.height, len(self.plates), len(self.doors),
+                            len(self.spawn_cells))
+                + self.tile_types.tobytes() + self.plates.astype("<i4").tobytes()
+                + self.doors.astype("<i4").tobytes() + self.spawn_cells.astype("<i8").tobytes())
+
+    @classmethod
+    def from_bytes(cls, data, digest):
+        magic, version, width, height, plates, doors, spawn_cells = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"not a compiled map of version {FORMAT_VERSION}")
+        arrays = []
+        offset = HEADER.size
+        for dtype, itemsize, rows, columns in (("u1", 1, height, width), ("<i4", 4, plates, 3),
+                                               ("<i4", 4, doors, 3), ("<i8", 8, spawn_cells, 1)):
+            arrays.append(np.frombuffer(data, dtype, rows * columns, offset).reshape(rows, columns))
+            offset += rows * columns * itemsize
+        arrays[-1] = arrays[-1].ravel()
+        if offset != len(data):
+            raise ValueError("compiled map has the wrong size")
+        return cls(*arrays, digest)
+
+
+def map_digest(text):
+    """the cache key of a map: changes whenever the text or the binary format changes"""
+    return hashlib.sha256(f"{FORMAT_VERSION}\n{text}".encode()).hexdigest()[:32]
+
+
+def compile_map(text):
+    """parses the text of a map file, see the top of this file"""
+    lines = text.strip().split("\n")
+    unknown = set("".join(lines)) - set("#.abcdABCD")
+    if unknown:
+        raise ValueError(f"unknown characters in map: {''.join(sorted(unknown))}")
+    tile_types, plates, doors = make_tile_types(max(len(line) for line in lines), len(lines), text)
+    border = np.concatenate((tile_types[0], tile_types[-1], tile_types[:, 0], tile_types[:, -1]))
+    if (border != WALL).any():
+        raise ValueError("the border of a map must be made out of walls (#)")
+    return CompiledMap(tile_types, np.array(plates, dtype=np.int32).reshape(-1, 3),
+                       np.array(doors, dtype=np.int32).reshape(-1, 3),
+                       np.flatnonzero(tile_types == FLOOR).astype(np.int64), map_digest(text))
+
+
+class MapCache:
+    cache_dir = os.path.join("maps", "cache")  # the compiled maps, one file per hash
+    compiled = {}  # {digest: CompiledMap} of this process
+    loaded = {}  # {(filename, modification time, size): CompiledMap}, saves reading and hashing the text
+
+    @classmethod
+    def load(cls, filename):
+        """returns the CompiledMap of a map file, compiles it only if it is not cached yet"""
+        stat = os.stat(filename)
+        key = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+        if key not in cls.loaded:
+            with open(filename) as f:
+                cls.loaded[key] = cls.get(f.read())
+        return cls.loaded[key]
+
+    @classmethod
+    def get(cls, text):
+        """returns the CompiledMap of a map text: from this process, from the disk cache or freshly compiled"""
+        digest = map_digest(text)
+        if digest in cls.compiled:
+            return cls.compiled[digest]
+        filename = os.path.join(cls.cache_dir, digest + ".map")
+        try:
+            with open(filename, "rb") as f:
+                game_map = CompiledMap.from_bytes(f.read(), digest)
+        except (OSError, ValueError, struct.error):  # not cached yet, or an old or broken file
+            game_map = compile_map(text)
+            os.makedirs(cls.cache_dir, exist_ok=True)
+            # several processes may compile the same map at once: write to a temporary file, then rename
+            temporary = f"{filename}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(game_map.to_bytes())
+            os.replace(temporary, filename)
+        cls.compiled[digest] = game_map
+        return game_map
+
+    @classmethod
+    def clear(cls):
+        """forget all maps of this process (the files in cache_dir stay)"""
+        cls.compiled = {}
+        cls.loaded = {}
+
+
+def map_files(paths):
+    """the map files in paths: every file as it is, every directory as its .txt files in alphabetical order"""
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".txt"))
+        else:
+            filenames.append(path)
+    return filenames
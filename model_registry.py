@@ -0,0 +1,85 @@
+"""process-wide registry of the keras models used by Agent.smart_action
+
+   every team's model is loaded only once per process and shared by all agents of that team.
+   when the .h5 file changes on disk (because a new model was trained), the model is loaded again,
+   so a long-running simulation picks up the new weights without a restart.
+
+   with the "numpy" backend the models are read from the .npz files next to the .h5 files
+   (see numpy_model.py) and run without tensorflow.
+"""
+import os
+import time
+
+import numpy as np
+
+
+class ModelRegistry:
+    filenames = {True: os.path.join("models", "model_seekers.h5"),  # {seeker: filename}
+                 False: os.path.join("models", "model_hiders.h5")}
+    models = {}  # {seeker: model}
+    mtimes = {}  # {seeker: modification time of the file when the model was loaded}
+    last_check = {}  # {seeker: time.monotonic() of the last look at the file}
+    check_interval = 1.0  # seconds between two looks at the modification time of a file
+    backend = "keras"  # or "numpy", see set_backend
+    backends = ("keras", "numpy")
+
+    @classmethod
+    def set_backend(cls, backend):
+        """"keras" (tensorflow and the .h5 files) or "numpy" (NumpyModel and the .npz files)"""
+        if backend not in cls.backends:
+            raise ValueError(f"unknown backend {backend}, use one of {', '.join(cls.backends)}")
+        if backend != cls.backend:
+            cls.backend = backend
+            cls.clear()
+
+    @classmethod
+    def filename(cls, seeker):
+        """the file of the team's model for the current backend"""
+        if cls.backend == "numpy":
+            return os.path.splitext(cls.filenames[seeker])[0] + ".npz"
+        return cls.filenames[seeker]
+
+    @classmethod
+    def get(cls, seeker):
+        """returns the (shared) model of the seekers or of the hiders"""
+        now = time.monotonic()
+        if seeker not in cls.models:
+            cls.load(seeker)
+        elif now - cls.last_check.get(seeker, 0) >= cls.check_interval:
+            cls.last_check[seeker] = now
+            try:
+                changed = os.stat(cls.filename(seeker)).st_mtime != cls.mtimes[seeker]
+            except OSError:
+                changed = False  # file is being replaced right now, keep the old model
+            if changed:
+                try:
+                    cls.load(seeker)
+                except Exception as error:  # half-written file etc., try again later
+                    print(f"could not reload {cls.filename(seeker)}, keeping the old model: {error}")
+        return cls.models[seeker]
+
+    @classmethod
+    def load(cls, seeker):
+        """loads the model from disk (the keras backend imports tensorflow) and warms it up with a dummy batch"""
+        filename = cls.filename(seeker)
+        mtime = os.stat(filename).st_mtime
+        if cls.backend == "numpy":
+            from numpy_model import NumpyModel
+            model = NumpyModel.load(filename)
+        else:
+            from tensorflow.keras.models import load_model
+            model = load_model(filename)
+        # the first predict call builds the graph and is much slower than all others
+        features = model.input_shape[-1] if getattr(model, "input_shape", None) else 15
+        model.predict(np.zeros((8, features)))
+        cls.models[seeker] = model
+        cls.mtimes[seeker] = mtime
+        cls.last_check[seeker] = time.monotonic()
+        return model
+
+    @classmethod
+    def clear(cls):
+        """forget all loaded models"""
+        cls.models = {}
+        cls.mtimes = {}
+        cls.last_check = {}
@@ -0,0 +1,130 @@
+"""plain numpy forward pass for the small dense keras models of the teams
+
+   export() copies the weights of a keras model made of Dense layers into an .npz file, NumpyModel.load()
+   reads it back and NumpyModel.predict() runs the network with numpy alone. no tensorflow import is needed,
+   and asking the model for the 8 actions of an agent takes microseconds instead of the milliseconds
+   of a keras predict call. ModelRegistry uses it with ModelRegistry.set_backend("numpy").
+
+   usage (needs tensorflow, writes models/model_seekers.npz and models/model_hiders.npz):
+   python numpy_model.py models/model_seekers.h5 models/model_hiders.h5
+
+   every exported model is compared with the keras model on random inputs, the export fails if the
+   outputs differ by more than --tolerance.
+"""
+import argparse
+import io
+import os
+import sys
+
+import numpy as np
+
+ACTIVATIONS = {"linear": lambda x: x,
+               "relu": lambda x: np.maximum(x, 0),
+               "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+               "tanh": np.tanh,
+               "softmax": lambda x: np.exp(x - x.max(axis=1, keepdims=True))
+                                    / np.exp(x - x.max(axis=1, keepdims=True)).sum(axis=1, keepdims=True)}
+# layers without weights that do nothing when the model predicts
+SKIPPED_LAYERS = ("InputLayer", "Dropout")
+
+
+class NumpyModel:
+
+    def __init__(self, kernels, biases, activations):
+        """kernels and biases: the weights of every Dense layer, activations: their names (see ACTIVATIONS)"""
+        for name in activations:
+            if name not in ACTIVATIONS:
+                raise ValueError(f"activation {name} is not supported")
+        self.kernels = [np.asarray(kernel, dtype=np.float32) for kernel in kernels]
+        self.biases = [np.asarray(bias, dtype=np.float32) for bias in biases]
+        self.activations = [ACTIVATIONS[name] for name in activations]
+        self.activation_names = list(activations)
+        self.input_shape = (None, self.kernels[0].shape[0])  # like keras, ModelRegistry reads it
+
+    def predict(self, features):
+        """returns the outputs (rows x outputs) for features (rows x inputs), like keras predict"""
+        x = np.asarray(features, dtype=np.float32)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            x = activation(x @ kernel + bias)
+        return x
+
+    def save(self, filename):
+        """writes the .npz file, through a temporary file: a running ModelRegistry may load it any time"""
+        arrays = {"activations": np.array(self.activation_names)}
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays[f"kernel_{i}"] = kernel
+            arrays[f"bias_{i}"] = bias
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        temporary = filename + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(temporary, filename)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename, allow_pickle=False) as arrays:
+            activations = arrays["activations"].tolist()
+            return cls([arrays[f"kernel_{i}"] for i in range(len(activations))],
+                       [arrays[f"bias_{i}"] for i in range(len(activations))], activations)
+
+
+def from_keras(model):
+    """a NumpyModel with the weights of a keras model. only Dense layers (and layers that do nothing
+       when predicting, see SKIPPED_LAYERS) can be converted, anything else raises a ValueError
+    """
+    kernels, biases, activations = [], [], []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in SKIPPED_LAYERS:
+            continue
+        if kind != "Dense":
+            raise ValueError(f"layer {layer.name} ({kind}) can not be exported, only Dense layers")
+        kernel, bias = layer.get_weights()
+        kernels.append(kernel)
+        biases.append(bias)
+        activations.append(layer.get_config()["activation"])
+    return NumpyModel(kernels, biases, activations)
+
+
+def difference(keras_model, numpy_model, rows=1000, seed=0):
+    """largest difference between the outputs of both models for random features"""
+    rng = np.random.default_rng(seed)
+    features = rng.integers(0, 6, (rows, numpy_model.input_shape[-1])).astype(np.float32)
+    return float(np.abs(np.asarray(keras_model.predict(features)) - numpy_model.predict(features)).max())
+
+
+def export(keras_model, filename, tolerance=1e-4):
+    """writes the weights of keras_model into filename (.npz) for NumpyModel.load.
+       raises a ValueError if the numpy forward pass does not give the same outputs
+    """
+    numpy_model = from_keras(keras_model)
+    error = difference(keras_model, numpy_model)
+    if error > tolerance:
+        raise ValueError(f"numpy outputs differ from keras by {error}, more than {tolerance}")
+    numpy_model.save(filename)
+    return numpy_model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="convert keras .h5 models into .npz files for NumpyModel")
+    parser.add_argument("models", nargs="+", help=".h5 files, every one gets an .npz file next to it")
+    parser.add_argument("--tolerance", type=float, default=1e-4,
+                        help="largest allowed difference between the keras and the numpy outputs")
+    args = parser.parse_args(argv)
+    from tensorflow.keras.models import load_model
+    failed = False
+    for filename in args.models:
+        target = os.path.splitext(filename)[0] + ".npz"
+        try:
+            export(load_model(filename), target, args.tolerance)
+        except ValueError as error:
+            print(f"{filename}: {error}")
+            failed = True
+        else:
+            print(f"{filename} -> {target}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""multi-process rollout farm
+
+   Simulation keeps its world in class attributes, so one process can only play one world at a time.
+   the farm starts several worker processes, every worker takes episodes from a shared queue, plays them and
+   streams the dataset rows and the statistics of each episode back to the collector (the main process),
+   which writes the csv files. episode n is seeded with seed + n (like in headless.py), so the same seed gives
+   the same episodes whatever the number of workers and whichever worker plays which episode.
+
+   usage:
+   python rollout_farm.py --workers 8 --episodes 100 --seed 1 --output data
+   python rollout_farm.py --workers 8 --episodes 10000 --maps maps --output data
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import signal
+import time
+import traceback
+
+from simulation import Simulation
+from dataset_writer import DatasetWriter
+from model_registry import ModelRegistry
+from map_loader import MapCache, map_files
+
+# every this many seconds the collector checks that no worker has died without saying "done"
+WORKER_CHECK_SECONDS = 5.0
+
+
+def worker(worker_id, seed, options, tasks, results, stop):
+    """plays episodes (numbers taken from tasks) until it gets None from tasks or stop is set.
+       episode n is seeded with seed + n.
+
+       puts these messages into results:
+       ("rows", worker_id, episode, [(seeker, dataset), ...]) ... some dataset rows
+       ("episode", worker_id, episode, stats) ... episode finished, stats is a dict
+       ("error", worker_id, None, traceback) ... an exception stopped this worker
+       ("done", worker_id, None, None) ... this worker has stopped
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # ctrl+c is handled by the collector
+    try:
+        Simulation.num_seekers = options["seekers"]
+        Simulation.num_hiders = options["hiders"]
+        Simulation.fov_algorithm = options["fov_algorithm"]
+        ModelRegistry.set_backend(options["backend"])
+        while not stop.is_set():
+            episode = tasks.get()
+            if episode is None:
+                break
+            game_map = MapCache.load(episode_map(options["maps"], episode)) if options["maps"] else None
+            Simulation.setup(options["width"], options["height"], options["boxes"], seed + episode, game_map)
+            start = time.perf_counter()
+            rows = []
+            while not Simulation.game_over() and not stop.is_set():
+                for agent in Simulation.tick(options["smart"]):
+                    rows.append((agent.seeker, list(agent.dataset)))
+                if len(rows) >= options["chunk_rows"]:
+                    results.put(("rows", worker_id, episode, rows))
+                    rows = []
+                if options["max_turns"] is not None and Simulation.turns >= options["max_turns"]:
+                    break
+            if rows:
+                results.put(("rows", worker_id, episode, rows))
+            results.put(("episode", worker_id, episode,
+                         {"worker": worker_id,
+                          "episode": episode,
+                          "seed": seed + episode,
+                          "turns": Simulation.turns,
+                          "seconds": time.perf_counter() - start,
+                          "points_hiders": Simulation.points_hiders,
+                          "points_seekers": Simulation.points_seekers,
+                          "aborted": stop.is_set(),
+                          }))
+    except Exception:
+        results.put(("error", worker_id, None, traceback.format_exc()))
+        raise
+    finally:
+        results.put(("done", worker_id, None, None))
+
+
+def episode_map(maps, episode):
+    """the map file of an episode: episode n plays on map n, the list starts again when it is used up"""
+    return maps[episode % len(maps)]
+
+
+def run_farm(workers, episodes, output, seed=0, seekers=3, hiders=3, boxes=None, width=40, height=30,
+             max_turns=10000, smart=False, fov_algorithm="raycasting", chunk_rows=500, maps=None, backend="keras"):
+    """plays episodes on several worker processes. episode number n uses the seed seed + n.
+       every episode gets its own sub-folder inside output.
+       maps: list of map files (see map_loader.py) instead of the built-in maze, see episode_map
+       backend: of the models for smart, "keras" or "numpy" (workers without tensorflow), see ModelRegistry
+       ctrl+c stops the workers after their current turn, everything received so far is written.
+       raises a RuntimeError if a worker fails with an exception or dies (killed, out of memory ...).
+
+       returns: list of the stats of all finished episodes
+    """
+    if maps:
+        for filename in maps:
+            MapCache.load(filename)  # compile every map once here, not in all workers at the same time
+    options = {"seekers": seekers, "hiders": hiders, "boxes": boxes, "width": width, "height": height,
+               "max_turns": max_turns, "smart": smart, "fov_algorithm": fov_algorithm, "chunk_rows": chunk_rows,
+               "maps": maps, "backend": backend}
+    tasks = multiprocessing.Queue()
+    for episode in range(episodes):
+        tasks.put(episode)
+    for _ in range(workers):
+        tasks.put(None)  # no more episodes
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=worker, name=f"rollout-worker-{n}",
+                                         args=(n, seed, options, tasks, results, stop))
+                 for n in range(workers)]
+    for p in processes:
+        p.start()
+
+    def interrupt(signum, frame):
+        print("stopping workers...")
+        stop.set()
+
+    writers = {}  # {episode: DatasetWriter}
+    stats = []
+    done = set()  # workers that said "done"
+    dead = set()  # workers found dead without "done" at the last check
+    last_check = time.monotonic()
+    old_handler = signal.signal(signal.SIGINT, interrupt)
+    try:
+        while len(done) < workers:
+            try:
+                message = results.get(timeout=WORKER_CHECK_SECONDS)
+            except queue.Empty:
+                message = None
+            if time.monotonic() - last_check >= WORKER_CHECK_SECONDS:
+                last_check = time.monotonic()
+                # only a worker that was dead at the last check already counts, its last messages had time to arrive
+                missing = {n for n, p in enumerate(processes) if n not in done and not p.is_alive()}
+                for n in sorted(missing & dead):
+                    raise RuntimeError(f"worker {n} died with exit code {processes[n].exitcode}")
+                dead = missing
+            if message is None:
+                continue
+            kind, worker_id, episode, payload = message
+            if kind == "rows":
+                if episode not in writers:
+                    directory = os.path.join(output, f"episode_{episode:05d}")
+                    os.makedirs(directory, exist_ok=True)
+                    lines = MapCache.load(episode_map(maps, episode)).height if maps else height
+                    writers[episode] = DatasetWriter(directory, height=lines)
+                for seeker, dataset in payload:
+                    writers[episode].add_row(seeker, dataset)
+            elif kind == "episode":
+                if episode in writers:
+                    writers.pop(episode).close()
+                stats.append(payload)
+                print(f"worker {worker_id}, episode {episode}: {payload['turns']} turns in "
+                      f"{payload['seconds']:.2f} seconds, hiders: {payload['points_hiders'][-1:]}, "
+                      f"seekers: {payload['points_seekers'][-1:]}{' (aborted)' if payload['aborted'] else ''}")
+            elif kind == "error":
+                raise RuntimeError(f"worker {worker_id} failed:\n{payload}")
+            elif kind == "done":
+                done.add(worker_id)
+    finally:
+        signal.signal(signal.SIGINT, old_handler)
+        stop.set()
+        for writer in writers.values():
+            writer.close()
+        for p in processes:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="play agentsnake episodes on several processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--episodes", type=int, default=1, help="number of episodes to play")
+    parser.add_argument("--seed", type=int, default=0, help="episode n uses seed + n")
+    parser.add_argument("--seekers", type=int, default=Simulation.num_seekers, help="number of seekers")
+    parser.add_argument("--hiders", type=int, default=Simulation.num_hiders, help="number of hiders")
+    parser.add_argument("--boxes", type=int, default=None,
+                        help=f"number of boxes (default: random between {Simulation.min_boxes} and {Simulation.max_boxes})")
+    parser.add_argument("--width", type=int, default=40, help="width of the playfield in cells")
+    parser.add_argument("--height", type=int, default=30, help="height of the playfield in cells")
+    parser.add_argument("--max-turns", type=int, default=10000,
+                        help="stop an episode after this many turns, 0 means no limit")
+    parser.add_argument("--smart", action="store_true", help="use the trained models instead of random actions")
+    parser.add_argument("--backend", choices=ModelRegistry.backends, default=ModelRegistry.backend,
+                        help="run the models with tensorflow or with numpy (the .npz files of numpy_model.py)")
+    parser.add_argument("--fov", choices=("raycasting", "shadowcasting"), default=Simulation.fov_algorithm,
+                        help="field of view algorithm")
+    parser.add_argument("--maps", nargs="+", default=None,
+                        help="map files or directories of .txt map files, played one after the other")
+    parser.add_argument("--output", default="data", help="directory for the csv files")
+    args = parser.parse_args(argv)
+    maps = map_files(args.maps) if args.maps is not None else None
+    if maps == []:
+        parser.error(f"no map files in {' '.join(args.maps)}")
+    run_farm(args.workers, args.episodes, args.output, args.seed, args.seekers, args.hiders, args.boxes,
+             args.width, args.height, args.max_turns or None, args.smart, args.fov, maps=maps,
+             backend=args.backend)
+
+
+if __name__ == "__main__":
+    main()
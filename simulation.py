@@ -0,0 +1,1233 @@
+"""pygame-free core of agentsnake: tiles, boxes, agents and the tick logic.
+
+   the Viewer in main.py only draws what happens here, the headless runner
+   in headless.py steps the very same simulation without any window
+"""
+import functools
+import heapq
+import logging
+import random
+import numpy as np
+
+import fov_tools
+from model_registry import ModelRegistry
+from tick_profiler import TickProfiler
+
+# the actions of the agents are logged on the debug level, see --verbose of headless.py and main.py
+log = logging.getLogger(__name__)
+
+maze1 = """
+#######################
+#.....................#
+#.....................#
+#......aaa.bbb.ccc....#
+#......aaa.bbb.ccc....#
+#.....................#
+##########AAA#BBB#CCC##
+#.....................#
+#........aaa.bbb.ccc..#
+#.....................#"""
+
+
+def choose_random_place():
+    """ choose a place in the playfield that is not occupied
+        by other boxes, agents, walls, pressure plates or doors.
+        every free place has the same chance, see Simulation.free_cells
+
+        returns: x,y [int]
+    """
+    if not Simulation.free_count:
+        raise ValueError("no free floor cell left in the playfield")
+    cell = int(Simulation.free_cells[Simulation.rng.randrange(Simulation.free_count)])
+    return cell % Simulation.width, cell // Simulation.width
+
+
+# tile type codes, as stored in Simulation.tile_types
+FLOOR, WALL, TRANSPARENT_WALL, PRESSURE_PLATE, DOOR = range(5)
+
+
+def make_tile_types(width, height, maze=maze1):
+    """builds the fence and the maze (default: maze1) for a playfield of width x height cells.
+       the maze is drawn from the top left corner. on a playfield smaller than the maze only the part inside
+       the fence is drawn (a door can lose its pressure plate). see map_loader.py for maps from files
+
+       returns: tile_types (uint8 array [y, x] of tile type codes),
+                list of pressure plates and list of doors, each as (x, y, key)
+    """
+    # create fence
+    tile_types = np.full((height, width), FLOOR, dtype=np.uint8)
+    tile_types[0, :] = WALL
+    tile_types[-1, :] = WALL
+    tile_types[:, 0] = WALL
+    tile_types[:, -1] = WALL
+
+    # create maze (walls/floors)
+    plates = []
+    doors = []
+    lines = maze.strip().split("\n")
+    for y, line in enumerate(lines[:height]):
+        for x, char in enumerate(line[:width]):
+            if char == "#":
+                tile_types[y, x] = WALL
+            elif char == ".":
+                tile_types[y, x] = FLOOR
+            elif char in "abcd":
+                tile_types[y, x] = PRESSURE_PLATE
+                plates.append((x, y, "abcd".index(char) + 1))
+            elif char in "ABCD":
+                tile_types[y, x] = DOOR
+                doors.append((x, y, "ABCD".index(char) + 1))
+    if len(lines) > height or max(len(line) for line in lines) > width:
+        # the maze was cut off: the fence goes over the maze again
+        tile_types[0, :] = WALL
+        tile_types[-1, :] = WALL
+        tile_types[:, 0] = WALL
+        tile_types[:, -1] = WALL
+        plates = [(x, y, key) for x, y, key in plates if 0 < x < width - 1 and 0 < y < height - 1]
+        doors = [(x, y, key) for x, y, key in doors if 0 < x < width - 1 and 0 < y < height - 1]
+    return tile_types, plates, doors
+
+
+class Tile:
+    """parent class of a basic tile like floor, wall etc.
+       tiles are never created per cell. the playfield only stores the tile type code of each cell
+       in Simulation.tile_types, the class itself is shared by all cells of that type (flyweight).
+       only PressurePlate and Door have instances, because they need a position and a key.
+       every class of a tile, box or agent has __slots__: no __dict__ per instance, less memory per entity
+    """
+    __slots__ = ()
+    code = FLOOR
+    block_sight = False
+    block_movement = False
+
+
+class Wall(Tile):
+    """outer border of playfield must be made out of walls"""
+    __slots__ = ()
+    code = WALL
+    color = (50, 50, 50)
+    block_sight = True
+    block_movement = True
+
+
+class TransparentWall(Tile):
+    """a wall out of transparent material"""
+    __slots__ = ()
+    code = TRANSPARENT_WALL
+    color = (0, 255, 255)  # light blue
+    block_sight = False
+
+
+class Floor(Tile):
+    """allows unrestricted movement of boxes, agents etc"""
+    __slots__ = ()
+    code = FLOOR
+    color = None
+
+
+class PressurePlate(Tile):
+    __slots__ = ("x", "y", "key")
+    code = PRESSURE_PLATE
+    color = (0, 255, 0)
+
+    def __init__(self, x, y, key=1):
+        self.x = x
+        self.y = y
+        self.key = key
+
+        Simulation.pressureplates.append(self)
+        Simulation.plate_keys[(x, y)] = key
+        Simulation.plate_load.setdefault(key, 0)
+
+
+class Door(Tile):
+    """block_sight and block_movement are only valid for a closed door.
+       opening or closing a door updates Simulation.block_sight and Simulation.block_movement
+    """
+    __slots__ = ("x", "y", "key", "_closed")
+    code = DOOR
+    block_sight = True
+    block_movement = True
+    coloropen = (255, 255, 255)
+    colorclosed = (0, 0, 0)
+
+    def __init__(self, x, y, key=1):
+        self.x = x
+        self.y = y
+        self.key = key
+        self._closed = True
+        Simulation.doors.append(self)
+        Simulation.doors_by_key.setdefault(key, []).append(self)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @closed.setter
+    def closed(self, closed):
+        if closed != self._closed:
+            Simulation.sight_changes.add((self.x, self.y))
+        self._closed = closed
+        # the door blocks the field of view (fov) and movement only when closed
+        Simulation.block_sight[self.y, self.x] = closed
+        Simulation.block_movement[self.y, self.x] = closed
+
+    @property
+    def color(self):
+        if self.closed:
+            return self.colorclosed
+        return self.coloropen
+
+
+# the flyweights, indexed by tile type code
+TILE_CLASSES = (Floor, Wall, TransparentWall, PressurePlate, Door)
+# lookup tables: tile type code -> blocking, for all tiles in their initial state (doors are closed)
+BLOCK_SIGHT = np.array([t.block_sight for t in TILE_CLASSES], dtype=bool)
+BLOCK_MOVEMENT = np.array([t.block_movement for t in TILE_CLASSES], dtype=bool)
+
+
+class Box:
+    __slots__ = ("x", "y", "dx", "dy", "d", "friction", "color", "locked", "index")
+    block_sight = True
+    block_movement = True
+    frictions = (32, 64, 96, 128, 160, 192, 224, 255)
+    colors = {friction: (friction, friction, 0) for friction in frictions}  # one color tuple for all boxes
+
+    def __init__(self, x=None, y=None):
+        if x is None and y is None:
+            x, y = choose_random_place()
+        elif not all((x, y)):  # anything other than None/False/0 is considered True for all
+            raise ValueError(f"x {x} and y {y} must be both None or must both be an integer vale! ")
+        self.x = x
+        self.y = y
+
+        self.dx = 0
+        self.dy = 0
+
+        self.d = 0
+        self.friction = Simulation.rng.choice(Box.frictions)  # TODO: need physic for friction
+        self.color = Box.colors[self.friction]
+        self.locked = False
+
+        self.index = len(Simulation.boxes)  # position in Simulation.boxes
+        Simulation.boxes.append(self)
+        Simulation.occupy(self)
+
+    def move(self):
+        if self.locked:
+            self.dx, self.dy = 0, 0
+            return
+        if Simulation.block_movement[self.y + self.dy, self.x + self.dx]:
+            self.dx, self.dy = 0, 0
+            return
+        things_in_path = Simulation.things_at(self.x + self.dx, self.y + self.dy)
+        for box in things_in_path:
+            if isinstance(box, Box):
+                box.dx = self.dx  # TODO: impulse to other boxes need physic !
+                box.dy = self.dy  # TODO: impulse to other boxes need physic !
+                Simulation.push_box(box)
+                self.dx, self.dy = 0, 0
+                return
+        if things_in_path:
+            # an agent (or corpse) is in the way
+            self.dx, self.dy = 0, 0
+            return
+        Simulation.relocate(self, self.x + self.dx, self.y + self.dy)
+        if self.dx != 0 or self.dy != 0:
+            self.d += Simulation.cell_size
+            if self.d > self.friction:
+                self.dx, self.dy = 0, 0
+                self.d = 0
+
+
+class Simulation:
+    agents = {}  # {agent_number: agent instance}
+    tile_types = np.zeros((0, 0), dtype=np.uint8)  # [y, x] -> tile type code like WALL
+    block_sight = np.zeros((0, 0), dtype=bool)  # [y, x] -> True if the tile blocks the field of view
+    block_movement = np.zeros((0, 0), dtype=bool)  # [y, x] -> True if the tile blocks movement
+    boxes = []
+    pressureplates = []
+    doors = []
+    plate_keys = {}  # {(x, y): key of the pressure plate at x, y}
+    plate_load = {}  # {key: number of boxes and agents (alive or dead) standing on pressure plates with this key}
+    doors_by_key = {}  # {key: [doors]}
+    triggered_keys = set()  # keys whose plate_load went from 0 to more or back to 0 since the last update_doors
+    door_listeners = []  # callables, called with the door after update_doors opened or closed it. reset keeps them
+    num_seekers = 3
+    num_hiders = 3
+    min_boxes = 60
+    max_boxes = 70
+    occupancy = {}  # {(x, y): [boxes and agents (alive or dead) standing at x, y]}
+    # all floor cells without box or agent, as y * width + x, in no particular order.
+    # only the first free_count items are valid. numpy arrays stay small even for very large maps
+    free_cells = np.zeros(0, dtype=np.int64)
+    free_count = 0
+    free_index = np.zeros(0, dtype=np.int64)  # [y * width + x] -> index in free_cells, or -1 if the cell is not free
+    moving_boxes = set()  # index (in boxes) of every box with an impulse, only these are moved by move_boxes
+    box_queue = None  # while move_boxes runs: heap of the box indices still to move in this turn
+    moving_box = -1  # while move_boxes runs: index of the box that moves right now
+    fov_windows = []  # (slice y, slice x) of every agent's fov map that was merged into the team maps
+    datasets = True  # False: tick() makes no dataset rows (they encode the whole map for every agent)
+    sight_changes = set()  # {(x, y) where a box came or went or a door opened or closed since the last fov update}
+    fov_map = []
+    seeker_fov_map = []
+    hider_fov_map = []
+    width = 0  # in cells
+    height = 0  # in cells
+    fov_algorithm = "raycasting"  # or "shadowcasting", see Agent.make_fov_map
+    cell_size = 20  # box friction is measured in pixels, one cell is 20 pixels wide
+    background_color = (255, 255, 255)  # agents never get this color
+    points_seekers = []
+    points_hiders = []
+    turns = 0
+    rng = random.Random()  # makes every random decision of the simulation, seed it for reproducible episodes
+    recording = None  # while recording: one dict {agent number: (action, argument)} per turn, see record()
+    replay = None  # list of turns like in recording, tick() plays these actions instead of random actions
+    profiler = TickProfiler()  # times the phases of every tick, reset() keeps it
+
+    @classmethod
+    def reset(cls):
+        """forget the old world, call this before setup() of a new episode"""
+        cls.agents = {}
+        cls.tile_types = np.zeros((0, 0), dtype=np.uint8)
+        cls.block_sight = np.zeros((0, 0), dtype=bool)
+        cls.block_movement = np.zeros((0, 0), dtype=bool)
+        cls.boxes = []
+        cls.pressureplates = []
+        cls.doors = []
+        cls.plate_keys = {}
+        cls.plate_load = {}
+        cls.doors_by_key = {}
+        cls.triggered_keys = set()
+        cls.occupancy = {}
+        cls.free_cells = np.zeros(0, dtype=np.int64)
+        cls.free_count = 0
+        cls.free_index = np.zeros(0, dtype=np.int64)
+        cls.moving_boxes = set()
+        cls.box_queue = None
+        cls.fov_windows = []
+        cls.sight_changes = set()
+        cls.fov_map = []
+        cls.seeker_fov_map = []
+        cls.hider_fov_map = []
+        cls.points_seekers = []
+        cls.points_hiders = []
+        cls.turns = 0
+        cls.recording = None
+        cls.replay = None
+        Agent.next_number = 0
+
+    @classmethod
+    def occupy(cls, thing):
+        """register a box or agent at its current position in the occupancy index"""
+        things = cls.occupancy.setdefault((thing.x, thing.y), [])
+        if not things:
+            cls.remove_free_cell(thing.x, thing.y)
+        things.append(thing)
+        if isinstance(thing, Box):
+            cls.sight_changes.add((thing.x, thing.y))  # boxes block the line of sight
+        if (thing.x, thing.y) in cls.plate_keys:
+            cls.press(cls.plate_keys[(thing.x, thing.y)], 1)
+
+    @classmethod
+    def vacate(cls, thing):
+        """remove a box or agent from the occupancy index"""
+        things = cls.occupancy[(thing.x, thing.y)]
+        things.remove(thing)
+        if not things:
+            del cls.occupancy[(thing.x, thing.y)]
+            if cls.tile_types[thing.y, thing.x] == FLOOR:
+                cls.add_free_cell(thing.x, thing.y)
+        if isinstance(thing, Box):
+            cls.sight_changes.add((thing.x, thing.y))
+        if (thing.x, thing.y) in cls.plate_keys:
+            cls.press(cls.plate_keys[(thing.x, thing.y)], -1)
+
+    @classmethod
+    def remove_free_cell(cls, x, y):
+        """takes x, y out of free_cells (if it is there), the last free cell takes its place"""
+        cell = y * cls.width + x
+        index = cls.free_index[cell]
+        if index < 0:
+            return
+        cls.free_count -= 1
+        last = cls.free_cells[cls.free_count]
+        cls.free_cells[index] = last
+        cls.free_index[last] = index
+        cls.free_index[cell] = -1
+
+    @classmethod
+    def add_free_cell(cls, x, y):
+        cell = y * cls.width + x
+        cls.free_cells[cls.free_count] = cell
+        cls.free_index[cell] = cls.free_count
+        cls.free_count += 1
+
+    @classmethod
+    def relocate(cls, thing, x, y):
+        """move a box or agent to x, y. always use this instead of setting thing.x and thing.y,
+           otherwise the occupancy index gets out of sync"""
+        cls.vacate(thing)
+        thing.x = x
+        thing.y = y
+        cls.occupy(thing)
+
+    @classmethod
+    def record(cls, agent, action, argument=None):
+        """remembers the action of agent in this turn, if recording is on (see Agent.replay_action)"""
+        if cls.recording is not None:
+            cls.recording[-1][agent.number] = (action, argument)
+
+    @classmethod
+    def press(cls, key, change):
+        """change is 1 when a box or agent steps onto a pressure plate with this key, -1 when it leaves"""
+        before = cls.plate_load[key]
+        cls.plate_load[key] = before + change
+        if (before == 0) != (cls.plate_load[key] == 0):
+            cls.triggered_keys.add(key)
+
+    @classmethod
+    def update_doors(cls):
+        """a door is open as long as a box or agent stands on one of the pressure plates with the door's key.
+           only the doors of triggered_keys are looked at, every door that opens or closes
+           is passed to all door_listeners
+        """
+        for key in sorted(cls.triggered_keys):
+            closed = cls.plate_load[key] == 0
+            for door in cls.doors_by_key.get(key, ()):
+                if door.closed != closed:
+                    door.closed = closed
+                    for listener in cls.door_listeners:
+                        listener(door)
+        cls.triggered_keys = set()
+
+    @classmethod
+    def things_at(cls, x, y):
+        """returns all boxes and agents (alive or dead) at x, y. do not modify the returned list"""
+        return cls.occupancy.get((x, y), ())
+
+    @classmethod
+    def setup(cls, width=40, height=30, boxes=None, seed=None, game_map=None):
+        """build fence, maze, boxes and agents for a new episode.
+           width and height are given in cells, not in pixels.
+           boxes is the number of boxes, None means a random number between min_boxes and max_boxes.
+           seed (re)starts Simulation.rng, the same seed and the same actions always give the same episode
+           game_map: a map_loader.CompiledMap instead of maze1, its size replaces width and height
+        """
+        cls.reset()
+        if seed is not None:
+            cls.rng.seed(seed)
+        if game_map is None:
+            cls.tile_types, plates, doors = make_tile_types(width, height)
+            cls.free_cells = np.flatnonzero(cls.tile_types == FLOOR)
+        else:
+            # the arrays of a compiled map are shared by all episodes on that map, only free_cells changes
+            cls.tile_types, plates, doors = game_map.tile_types, game_map.plates.tolist(), game_map.doors.tolist()
+            cls.free_cells = game_map.spawn_cells.copy()
+            height, width = cls.tile_types.shape
+        cls.width = width
+        cls.height = height
+        for x, y, key in plates:
+            PressurePlate(key=key, x=x, y=y)
+        for x, y, key in doors:
+            Door(key=key, x=x, y=y)
+        # all doors start closed
+        cls.block_sight = BLOCK_SIGHT[cls.tile_types]
+        cls.block_movement = BLOCK_MOVEMENT[cls.tile_types]
+        cls.free_count = len(cls.free_cells)
+        cls.free_index = np.full(width * height, -1, dtype=np.int64)
+        cls.free_index[cls.free_cells] = np.arange(cls.free_count)
+        # the team maps, tick() only clears and merges the fov windows of the agents
+        cls.fov_map = np.zeros((height, width), dtype=bool)
+        cls.seeker_fov_map = np.zeros((height, width), dtype=bool)
+        cls.hider_fov_map = np.zeros((height, width), dtype=bool)
+
+        if boxes is None:
+            boxes = cls.rng.randint(cls.min_boxes, cls.max_boxes)
+        for b in range(boxes):
+            Box()
+
+        for _ in range(cls.num_seekers):
+            Agent(seeker=True)
+        for _ in range(cls.num_hiders):
+            Agent(seeker=False)
+
+    @classmethod
+    def tick(cls, smart=False):
+        """advance the world by one turn. the agents play the actions of Simulation.replay if there is one,
+           otherwise smart or random actions.
+           returns the list of agents that have a fresh dataset row in agent.dataset
+        """
+        cls.profiler.start()
+        if cls.recording is not None:
+            cls.recording.append({})
+        if cls.replay is not None:
+            actions = cls.replay[cls.turns]
+            for a in cls.agents.values():
+                if a.hp > 0:
+                    if a.number not in actions:
+                        raise ValueError(f"replay does not match the episode: agent {a.number} "
+                                         f"has no action in turn {cls.turns}")
+                    a.random_action(actions[a.number])
+                    a.turns_alive += 1
+        elif smart:
+            cls.smart_actions()
+        else:
+            for a in cls.agents.values():
+                if a.hp > 0:
+                    a.random_action()
+                    a.turns_alive += 1
+        cls.profiler.lap("actions")
+        cls.move_boxes()
+        cls.profiler.lap("boxes")
+        # ---pressureplates: open or close the doors whose plates were entered or left in this turn ---
+        cls.update_doors()
+        cls.profiler.lap("doors")
+        # update field of view for each agent, but only where something has changed
+        for a in cls.agents.values():
+            if a.hp > 0:
+                a.update_fov_map()
+        cls.sight_changes = set()
+        cls.profiler.lap("fov")
+
+        # update global fov map, make everything dark (only where the agents did light it in the last turn)
+        for window in cls.fov_windows:
+            cls.fov_map[window] = False
+            cls.seeker_fov_map[window] = False
+            cls.hider_fov_map[window] = False
+        cls.fov_windows = []
+        # update indivdiual fov map for each agent, make global map light
+        recorded = []
+        for agent in [a for a in cls.agents.values() if a.hp > 0]:
+            x0, y0 = agent.fov_origin
+            height, width = agent.fov_map.shape
+            window = (slice(y0, y0 + height), slice(x0, x0 + width))
+            cls.fov_windows.append(window)
+            cls.fov_map[window] |= agent.fov_map
+            if agent.seeker:
+                cls.seeker_fov_map[window] |= agent.fov_map
+            else:
+                cls.hider_fov_map[window] |= agent.fov_map
+            cls.profiler.lap("team maps")
+
+            if not agent.dataset or not cls.datasets:
+                continue  # only random_action makes a dataset row
+            # every agent has empty dummy dataset (zeros)
+            agent.observation = fovmap_to_observation(cls.seeker_fov_map if agent.seeker else cls.hider_fov_map,
+                                                      agent)
+            intlist = observation_to_dataset(agent.observation)
+            for i, val in enumerate(intlist):
+                agent.dataset[12 + i] = val
+            recorded.append(agent)
+            cls.profiler.lap("datasets")
+
+        hiders_alive = len([h for h in cls.agents.values() if not h.seeker and h.hp > 0])
+        cls.points_hiders.append(hiders_alive)
+        cls.points_seekers.append(cls.num_hiders - hiders_alive)
+        cls.turns += 1
+        cls.profiler.lap("points")
+        return recorded
+
+    @classmethod
+    def move_boxes(cls):
+        """Box.move for every box with an impulse, in the order of boxes, like a loop over all boxes would do.
+           boxes without impulse are skipped, their move would not do anything.
+           a box that gets an impulse during the loop (see push_box) still moves in this turn,
+           if it comes later in boxes
+        """
+        cls.box_queue = sorted(cls.moving_boxes)  # a sorted list is a heap
+        cls.moving_boxes = set()
+        while cls.box_queue:
+            box = cls.boxes[heapq.heappop(cls.box_queue)]
+            cls.moving_box = box.index
+            box.move()
+            if box.dx or box.dy:
+                cls.moving_boxes.add(box.index)
+        cls.box_queue = None
+        cls.moving_box = -1
+
+    @classmethod
+    def push_box(cls, box):
+        """call this after setting box.dx or box.dy, otherwise the box does not move"""
+        if cls.box_queue is not None and box.index > cls.moving_box:
+            if box.index not in cls.box_queue:
+                heapq.heappush(cls.box_queue, box.index)
+        else:
+            cls.moving_boxes.add(box.index)
+
+    @classmethod
+    def smart_actions(cls):
+        """all living agents do their smart_action. instead of asking the model 8 times per agent,
+           the features of all seekers (and of all hiders) are stacked into one matrix,
+           so each model is asked only once per turn.
+           all agents decide on the world as it was at the start of the turn.
+        """
+        living = [a for a in cls.agents.values() if a.hp > 0]
+        possible_points = {}  # {agent_number: 8 predictions}
+        for seeker in (True, False):
+            team = [a for a in living if a.seeker == seeker]
+            if not team:
+                continue
+            features = np.array([row for a in team for row in a.smart_features()])
+            predictions = ModelRegistry.get(seeker).predict(features)[:, 0].reshape(len(team), 8)
+            for a, points in zip(team, predictions):
+                possible_points[a.number] = points
+        for a in living:
+            if a.hp > 0:  # not killed by an agent that moved earlier in this turn
+                a.smart_action(possible_points[a.number])
+                a.turns_alive += 1
+
+    @classmethod
+    def game_over(cls):
+        """True when no hider is left alive"""
+        return not any([h.hp for h in cls.agents.values() if not h.seeker])
+
+
+class Agent:
+    __slots__ = ("number", "torch_radius", "hp", "fov", "fov_map", "fov_origin", "fov_key", "seeker",
+                 "enemy_north", "enemy_east", "enemy_south", "enemy_west",
+                 "box_north", "box_east", "box_south", "box_west",
+                 "lastpoints", "lastdx", "lastdy", "grabbing_state", "grabbed_box", "turns_alive",
+                 "x", "y", "dataset", "observation", "color", "viewdirection", "viewrange")
+    next_number = 0
+    # points for the action of a turn, by action name. the same for all agents
+    rewards = {"move": 0,
+               "grab": 0,
+               "kick": 0,
+               "drop": 0,
+               "wait": -5}
+
+    def __init__(self, seeker=False, x=None, y=None, hp=1):
+        self.number = Agent.next_number
+        Agent.next_number += 1
+        self.torch_radius = 5
+        self.hp = hp
+        # field of view: a bool array, matching Simulation.tile_types. each item can be True or False
+        self.fov = []
+        self.fov_map = None  # bool array of the torch square, see make_fov_map
+        self.fov_origin = (0, 0)  # x, y of the top left cell of fov_map
+        self.fov_key = None  # (x, y, torch_radius, fov_algorithm) of the last make_fov_map, see update_fov_map
+        self.seeker = seeker
+
+        self.enemy_north = 0
+        self.enemy_east = 0
+        self.enemy_south = 0
+        self.enemy_west = 0
+
+        self.box_north = 0
+        self.box_east = 0
+        self.box_south = 0
+        self.box_west = 0
+
+        self.lastpoints = Simulation.num_hiders if not self.seeker else 0
+        self.lastdx = 0
+        self.lastdy = 0
+
+        self.grabbing_state = 0  # 0 (or False) ..... No State (can move, grab, push)
+                                 # 1 (or True) ..... Grabbed Box (can move, drop)
+
+        self.grabbed_box = None  # reference to the grabbed box instance, can also be a corpse
+
+        self.turns_alive = 0  # counter, how many turns agent was alive
+
+        if x is None and y is None:
+            x, y = choose_random_place()
+        elif not all((x, y)):  # anything other than None/False/0 is considered True for all
+            raise ValueError(f"x {x} and y {y} must be both None or must both be an integer vale! ")
+
+        self.x = x
+        self.y = y
+        Simulation.occupy(self)
+
+        self.dataset = ()  # the row of the last action, empty before the first one
+        self.observation = None  # uint8 array, what the team of this agent sees (see fovmap_to_observation)
+
+        red_min, green_min, blue_min = 0, 0, 0
+        red_max, green_max, blue_max = 255, 255, 255
+        if self.seeker is True:
+            red_min = 255
+            green_max = 50
+            blue_max = 50
+        else:
+            red_max = 50
+            green_max = 50
+            blue_min = 255
+        self.color = self.choose_random_color(red_min, red_max, green_min, green_max, blue_min, blue_max)
+
+        self.viewdirection = 0
+        self.viewrange = 5
+
+        Simulation.agents[self.number] = self
+
+    @property
+    def model(self):
+        """the keras model of the agent's team, shared by all agents of the team (see ModelRegistry).
+           it is loaded (and tensorflow is imported) only when smart_action needs it,
+           random_action works without tensorflow"""
+        return ModelRegistry.get(self.seeker)
+
+    def check_for_enemies(self):
+        self.enemy_north = 0
+        self.enemy_east = 0
+        self.enemy_south = 0
+        self.enemy_west = 0
+
+        for e in [s for s in Simulation.agents.values() if s.seeker != self.seeker and s.hp > 0]:
+            distx = e.x-self.x
+            disty = e.y-self.y
+            dist = (distx**2+disty**2)**0.5
+            if dist <= self.torch_radius:
+                if e.y < self.y:
+                    self.enemy_north += self.torch_radius-(self.y-e.y)
+                if e.y > self.y:
+                    self.enemy_south += self.torch_radius-(e.y-self.y)
+                if e.x < self.x:
+                    self.enemy_west += self.torch_radius-(self.x-e.x)
+                if e.x > self.x:
+                    self.enemy_east += self.torch_radius-(e.x-self.x)
+
+    def check_for_boxes(self):
+        self.box_north = 0
+        self.box_east = 0
+        self.box_south = 0
+        self.box_west = 0
+
+        for b in [box for box in Simulation.boxes]:
+            distx = b.x-self.x
+            disty = b.y-self.y
+            dist = (distx**2+disty**2)**0.5
+            if dist <= self.torch_radius:
+                if b.y < self.y:
+                    self.box_north += 1 #self.torch_radius-(self.y-b.y)
+                if b.y > self.y:
+                    self.box_south += 1 #self.torch_radius-(b.y-self.y)
+                if b.x < self.x:
+                    self.box_west += 1 #self.torch_radius-(self.x-b.x)
+                if b.x > self.x:
+                    self.box_east += 1 #self.torch_radius-(b.x-self.x)
+
+
+    def get_objects_near_me(self):
+        """returns a list of boxes or corpses around my position"""
+        near_me = []
+        # for (dx,dy) in ((-1,-1),(0,-1),(1,-1),(-1,0),(1,0),(-1,1),(0,1),(1,1) ):
+        for (dx, dy) in ((0, -1), (-1, 0), (1, 0), (0, 1)):
+            for item in Simulation.things_at(self.x + dx, self.y + dy):
+                if isinstance(item, Box) or item.hp <= 0:
+                    near_me.append(item)
+        return near_me
+
+    def choose_random_color(self, red_min=0, red_max=255, green_min=0, green_max=255, blue_min=0, blue_max=255):
+        """returns a color not used by another agent or by Simulation_background_color"""
+        while True:
+            color = (
+            Simulation.rng.randint(red_min, red_max), Simulation.rng.randint(green_min, green_max),
+            Simulation.rng.randint(blue_min, blue_max))
+            if color == Simulation.background_color:
+                continue
+            if color in [a.color for a in Simulation.agents.values()]:
+                continue
+            return color
+
+    def random_action(self, recorded=None):
+        """does a random action and makes the dataset row for it.
+           recorded is an (action, argument) tuple of Simulation.replay, done instead of a random action
+        """
+        if recorded is None:
+            possible_actions = [self.wait, self.move_random]
+
+            near_me = self.get_objects_near_me()
+            if near_me:  # same as : if len(get_objects_near_me()) > 0:
+                possible_actions.append(self.kick)  # grabbed box is excluded from kicking in later code
+                if not self.grabbing_state:
+                    possible_actions.append(self.grab)
+            if self.grabbing_state:
+                possible_actions.append(self.drop)
+
+            action = Simulation.rng.choice(possible_actions)
+            action()
+        else:
+            action = self.replay_action(*recorded)
+
+        points = 0
+
+        self.dataset = []
+        dataset = []
+        for _ in range(10):
+            dataset.append(0)
+        if self.lastdx == 0 and self.lastdy == -1:
+            points += self.rewards["move"]
+            dataset[0] = 1
+        if self.lastdx == 1 and self.lastdy == 0:
+            points += self.rewards["move"]
+            dataset[1] = 1
+        if self.lastdx == 0 and self.lastdy == 1:
+            points += self.rewards["move"]
+            dataset[2] = 1
+        if self.lastdx == -1 and self.lastdy == 0:
+            points += self.rewards["move"]
+            dataset[3] = 1
+        if Simulation.block_movement[self.y + self.lastdy, self.x + self.lastdx]:
+            points -= 1
+            dataset[8] = 1
+        dataset[9] = self.grabbing_state
+        self.lastdx, self.lastdy = 0, 0
+        if action == self.grab:
+            points += self.rewards["grab"]
+            dataset[4] = 1
+        elif action == self.drop:
+            points += self.rewards["drop"]
+            dataset[5] = 1
+        elif action == self.kick:
+            points += self.rewards["kick"]
+            dataset[6] = 1
+        elif action == self.wait:
+            points += self.rewards["wait"]
+            dataset[7] = 1
+
+        dataset.append(self.x)
+        dataset.append(self.y)
+
+        # dummy fov (all zeros), one value per line of the playfield. the viewer fills in the real values
+        dataset.extend([0] * Simulation.height)
+
+        if self.get_objects_near_me():
+            dataset.append(1)
+        else:
+            dataset.append(0)
+
+        dataset.append(points)
+        self.dataset = dataset
+
+    def smart_features(self):
+        """returns the 8 rows of features for the model, one row for each possible action
+           (north, east, south, west, grab, drop, kick, wait)"""
+        rows = []
+        self.check_for_enemies()
+        #self.check_for_boxes()
+        near_me = 1 if self.get_objects_near_me() else 0
+        for _ in range(8):
+            testdata = [0,0,0,0,0,0,0,0,0,0]
+            testdata[_] = 1
+            if testdata[0] == 1:
+                if Simulation.block_movement[self.y-1, self.x+0]:
+                    testdata[8] = 1
+            elif testdata[1] == 1:
+                if Simulation.block_movement[self.y+0, self.x+1]:
+                    testdata[8] = 1
+            elif testdata[2] == 1:
+                if Simulation.block_movement[self.y+1, self.x+0]:
+                    testdata[8] = 1
+            elif testdata[3] == 1:
+                if Simulation.block_movement[self.y+0, self.x-1]:
+                    testdata[8] = 1
+            testdata[9] = self.grabbing_state
+            testdata.append(self.enemy_north)
+            testdata.append(self.enemy_east)
+            testdata.append(self.enemy_south)
+            testdata.append(self.enemy_west)
+            testdata.append(near_me)
+            #testdata.append(self.box_north)
+            #testdata.append(self.box_east)
+            #testdata.append(self.box_south)
+            #testdata.append(self.box_west)
+            rows.append(testdata)
+        return rows
+
+    def smart_action(self, possible_points=None):
+        """does the action for which the model predicts the most points.
+           possible_points are the 8 predictions for smart_features(), if the model was already asked
+           (see Simulation.smart_actions). otherwise the model is asked here.
+        """
+        if possible_points is None:
+            possible_points = self.model.predict(np.array(self.smart_features()))[:, 0]
+        highp_idx = int(np.argmax(possible_points))
+        log.debug("%s: best action %s", self.number, highp_idx)
+        dx, dy = 0, 0
+        if highp_idx == 0:
+            dy = -1
+        elif highp_idx == 1:
+            dx = 1
+        elif highp_idx == 2:
+            dy = 1
+        elif highp_idx == 3:
+            dx = -1
+        if dx != 0 or dy != 0:
+            log.debug("%s: move(%s,%s)", self.number, dx, dy)
+            self.move(dx, dy)
+        if highp_idx == 4:
+            log.debug("%s: grab()", self.number)
+            self.grab()
+        elif highp_idx == 5:
+            log.debug("%s: drop()", self.number)
+            self.drop()
+        elif highp_idx == 6:
+            log.debug("%s: kick()", self.number)
+            self.kick()
+        elif highp_idx == 7:
+            log.debug("%s: wait()", self.number)
+            self.wait()
+
+    def replay_action(self, action, argument=None):
+        """does an action as recorded by Simulation.record.
+           returns the method that random_action would have chosen for it
+        """
+        if action == "move":
+            self.lastdx, self.lastdy = argument
+            self.move(*argument)
+            return self.move_random
+        if action == "grab":
+            self.grab(argument)
+            return self.grab
+        if action == "kick":
+            self.kick(argument)
+            return self.kick
+        if action == "drop":
+            self.drop()
+            return self.drop
+        self.wait()
+        return self.wait
+
+    def wait(self):
+        Simulation.record(self, "wait")
+
+    def drop(self):
+        self.grabbing_state = 0
+        self.grabbed_box = None
+
+    def move_random(self):
+        # directions =  ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+        directions = ((0, -1), (-1, 0), (1, 0), (0, 1),)
+        dx, dy = Simulation.rng.choice(directions)
+        self.lastdx, self.lastdy = dx, dy
+        self.move(dx, dy)
+
+    def move(self, dx, dy):
+        Simulation.record(self, "move", (dx, dy))
+        ok = True
+        if Simulation.block_movement[self.y + dy, self.x + dx]:
+            return  # no movement
+        things_in_my_path = Simulation.things_at(self.x + dx, self.y + dy)
+        # run into other agents? corpses are blocking the way, like boxes
+        for other in things_in_my_path:
+            if not isinstance(other, Agent) or other.number == self.number:
+                continue
+            if self.seeker and not other.seeker and other.hp > 0:
+                other.hp = 0  # kill hider if self.seeker
+            if other.seeker and not self.seeker:
+                self.hp = 0  # kill myself
+            return  # no movement
+
+        # box blocks movement?
+        for box in things_in_my_path:
+            if box != self.grabbed_box:
+                return  # no movement
+
+        oldx, oldy = self.x, self.y
+        Simulation.relocate(self, self.x + dx, self.y + dy)
+        # print("moving...")
+        # print("state:", self.grabbing_state)
+        if self.grabbing_state:
+            # Box is grabbed -> Move with us
+            Simulation.relocate(self.grabbed_box, oldx, oldy)
+            log.debug("%s: moved grabbing box %s", self.number, self.grabbed_box)
+
+    def grab(self, choice=None):
+        """grabs one of get_objects_near_me(), choice is its index (default: random)"""
+        near_me = self.get_objects_near_me()
+        if self.grabbing_state == 1 or not near_me:
+            # already busy grabbing box or no object to grab
+            Simulation.record(self, "grab")
+            return
+        if choice is None:
+            choice = Simulation.rng.randrange(len(near_me))  # same as rng.choice(near_me)
+        Simulation.record(self, "grab", choice)
+        self.grabbed_box = near_me[choice]
+        self.grabbing_state = 1
+        log.debug("%s: grabbing %s at %s,%s", self.number, self.grabbed_box, self.grabbed_box.x, self.grabbed_box.y)
+
+    def drop(self):
+        Simulation.record(self, "drop")
+        if self.grabbing_state != 1:
+            # no box grabbed
+            return
+        log.debug("%s: dropping", self.number)
+        self.grabbing_state = 0
+        self.grabbed_box = None
+
+    def kick(self, choice=None):
+        """kicks one of the objects near me, choice is its index (default: random)"""
+        if self.grabbing_state == 1:
+            # cant kick when grabbing box
+            Simulation.record(self, "kick")
+            return
+        # directions = ((0, 1), (1, 0), (0, -1), (-1, 0))
+        near_me = [item for item in self.get_objects_near_me() if item != self.grabbed_box]
+        if not near_me:
+            Simulation.record(self, "kick")
+            return
+        if choice is None:
+            choice = Simulation.rng.randrange(len(near_me))  # same as rng.choice(near_me)
+        Simulation.record(self, "kick", choice)
+        kicked_object = near_me[choice]
+        if isinstance(kicked_object, Box):  # corpses do not slide
+            kicked_object.dx, kicked_object.dy = kicked_object.x - self.x, kicked_object.y - self.y
+            Simulation.push_box(kicked_object)
+
+    def update_fov_map(self):
+        """calls make_fov_map only if the fov map could have changed since the last call:
+           the agent has moved, or a box or door inside the torch square changed (see Simulation.sight_changes).
+           returns True if the fov map was made new
+        """
+        key = (self.x, self.y, self.torch_radius, Simulation.fov_algorithm)
+        if key == self.fov_key and not any(abs(x - self.x) <= self.torch_radius and
+                                           abs(y - self.y) <= self.torch_radius
+                                           for x, y in Simulation.sight_changes):
+            return False  # the old fov map is still correct
+        self.make_fov_map()
+        self.fov_key = key
+        return True
+
+    def make_fov_map(self, remove_artifacts=False):
+        """self.fov_map only covers the torch square around the agent (cut off at the edges of the playfield),
+           its top left cell is at self.fov_origin. so the work does not grow with the size of the playfield
+        """
+        # clear fov_map
+        px, py, = self.x, self.y
+        x0, y0 = max(0, px - self.torch_radius), max(0, py - self.torch_radius)
+        x1 = min(Simulation.width, px + self.torch_radius + 1)
+        y1 = min(Simulation.height, py + self.torch_radius + 1)
+        self.fov_origin = (x0, y0)
+        self.fov_map = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+        if Simulation.fov_algorithm == "shadowcasting":
+            # artifact-free, no need to remove_artifacts
+            fov_tools.shadowcast((px, py), self.torch_radius, self.is_blocking_sight, self.fov_map, (x0, y0))
+            return
+        # self.checked = set() # clear the set of checked coordinates
+        # set all tiles to False
+        # set player's tile to visible
+        self.fov_map[py - y0, px - x0] = True
+        # the rays from player to the end of torchradius / torchsquare only depend on the torch_radius
+        for ray in fov_rays(self.torch_radius):
+            self.calculate_fov_points(ray)
+        # print(Game.fov_map)
+        # ---------- the fov map is now ready to use, but has some ugly artifacts ------------
+        # ---------- start post-processing fov map to clean up the artifacts ---
+        if not remove_artifacts:
+            return
+        # -- basic idea: divide the torch-square into 4 equal sub-squares.
+        # -- look of a invisible wall is behind (from the player perspective) a visible
+        # -- ground floor. if yes, make this wall visible as well.
+        # -- see https://sites.google.com/site/jicenospam/visibilitydetermination
+        # ------ north-west of player
+        for xstart, ystart, xstep, ystep, neighbors in [
+            (-self.torch_radius, -self.torch_radius, 1, 1, [(0, 1), (1, 0), (1, 1)]),
+            (-self.torch_radius, self.torch_radius, 1, -1, [(0, -1), (1, 0), (1, -1)]),
+            (self.torch_radius, -self.torch_radius, -1, 1, [(0, -1), (-1, 0), (-1, -1)]),
+            (self.torch_radius, self.torch_radius, -1, -1, [(0, 1), (-1, 0), (-1, 1)])]:
+
+            for x in range(px + xstart, px, xstep):
+                for y in range(py + ystart, py, ystep):
+                    # not even in fov?
+                    if not (x0 <= x < x1 and y0 <= y < y1):
+                        continue
+                    visible = self.fov_map[y - y0, x - x0]
+                    if visible:
+                        continue  # next, i search invisible tiles!
+                    # oh, we found an invisble tile! now let's check:
+                    # is it a wall?
+                    if not Simulation.block_sight[y, x]:
+                        continue  # next, i search walls!
+                    # --ok, found an invisible wall.
+                    # check south-east neighbors
+
+                    for dx, dy in neighbors:
+                        # does neigbor even exist?
+                        if not (x0 <= x + dx < x1 and y0 <= y + dy < y1):
+                            continue
+                        v = self.fov_map[y + dy - y0, x + dx - x0]
+                        t_block_sight = Simulation.block_sight[y + dy, x + dx]
+                        # is neighbor a tile AND visible?
+                        if not t_block_sight and v == True:
+                            # ok, found a visible floor tile neighbor. now let's make this wall
+                            # visible as well
+                            self.fov_map[y - y0, x - x0] = True
+                            break  # other neighbors are irrelevant now
+
+    @staticmethod
+    def is_blocking_sight(x, y):
+        """True if walls, closed doors or boxes at x,y block the line of sight (or x,y is outside)"""
+        if not (0 <= x < Simulation.width and 0 <= y < Simulation.height):
+            return True
+        if Simulation.block_sight[y, x]:
+            return True
+        # outcomment the next line if boxes shall NOT break line of sight
+        return any(isinstance(b, Box) for b in Simulation.things_at(x, y))
+
+    def calculate_fov_points(self, ray):
+        """needs a ray of (dx, dy) offsets relative to the player, as made by fov_rays()"""
+        ox, oy = self.fov_origin
+        for dx, dy in ray:
+            x, y = self.x + dx, self.y + dy
+            # outside of dungeon level ?
+            if not (0 <= x < Simulation.width and 0 <= y < Simulation.height):
+                continue
+            tile_block_sight = Simulation.block_sight[y, x]
+            self.fov_map[y - oy, x - ox] = True  # make this tile visible
+            if tile_block_sight:
+                break  # forget the rest
+            # outcomment the next lines if boxes shall NOT break line of sight
+            if any(isinstance(b, Box) for b in Simulation.things_at(x, y)):
+                break  # forget the rest
+
+
+@functools.lru_cache(maxsize=None)
+def fov_rays(torch_radius):
+    """precomputes the field of view rays for a torch_radius.
+       every ray is a Bresenham line (see get_line) from the player to one point at the edge of the
+       torchsquare, given as tuple of (dx, dy) offsets relative to the player.
+       the player tile itself and points outside the torch radius are already left out.
+
+       returns: tuple of rays, each ray a tuple of (dx, dy)
+    """
+    endpoints = []
+    for y in range(-torch_radius, torch_radius + 1):
+        if y == -torch_radius or y == torch_radius:
+            for x in range(-torch_radius, torch_radius + 1):
+                endpoints.append((x, y))
+        else:
+            endpoints.append((-torch_radius, y))
+            endpoints.append((torch_radius, y))
+    rays = []
+    for endpoint in endpoints:
+        ray = tuple((x, y) for x, y in get_line((0, 0), endpoint)
+                    if (x, y) != (0, 0) and x * x + y * y <= torch_radius * torch_radius)
+        rays.append(ray)
+    return tuple(rays)
+
+
+def fovmap_to_observation(fovmap, agent):
+    # Team Map
+    """returns a uint8 array with one code for every tile, as seen by the team of agent.
+    Dataset Legend:
+    0 ... not visible
+    !=0 ... visible
+    2 ... Wall/Closed Door
+    3 ... Box
+    5 ... Teammate
+    6 ... Enemy
+    4 ... Pressure Plate
+    1 ... Empty Floor/Open Door
+    """
+    tile_types = Simulation.tile_types
+    closed = (tile_types == DOOR) & Simulation.block_movement  # doors are blocking only when closed
+    codes = np.zeros(tile_types.shape, dtype=np.uint8)
+    codes[(tile_types == FLOOR) | ((tile_types == DOOR) & ~closed)] = 1
+    codes[tile_types == PRESSURE_PLATE] = 4
+    # boxes before seekers before hiders, walls and closed doors hide everything standing on them
+    for (x, y), things in Simulation.occupancy.items():
+        if any(isinstance(t, Box) for t in things):
+            codes[y, x] = 3
+        elif any(isinstance(t, Agent) and t.seeker for t in things):
+            codes[y, x] = 5 if agent.seeker else 6
+        elif any(isinstance(t, Agent) and not t.seeker for t in things):
+            codes[y, x] = 6 if agent.seeker else 5
+    codes[(tile_types == WALL) | closed] = 2
+    codes[~fovmap] = 0
+    return codes
+
+
+def observation_to_dataset(observation):
+    """every line of the observation becomes one big int: the digits of the line, read as a decimal number"""
+    digits = observation + ord("0")
+    return [int(line.tobytes()) for line in digits]
+
+
+def convert_fovmap_to_dataset(fovmap, agent):
+    """the fov part of the csv dataset, see fovmap_to_observation for the meaning of the digits"""
+    return observation_to_dataset(fovmap_to_observation(fovmap, agent))
+
+
+# the columns of agent.dataset before and after the fov columns (one fov column per line of the playfield)
+DATASET_COLUMNS_BEFORE_FOV = ("GoNorth", "GoEast", "GoSouth", "GoWest", "Grab", "Drop", "Kick", "Wait",
+                              "RunAgainstWall", "GrabbedSMTH", "PosX", "PosY")
+DATASET_COLUMNS_AFTER_FOV = ("BoxNextToMe", "Points")
+
+
+def dataset_header(height=None):
+    """the first line of data_hiders.csv and data_seekers.csv, for a playfield with height lines
+       (default: Simulation.height)"""
+    if height is None:
+        height = Simulation.height
+    header = ",".join(DATASET_COLUMNS_BEFORE_FOV) + ","
+    for l in range(height):
+        header += "fov" + str(l) + ","
+    header += ",".join(DATASET_COLUMNS_AFTER_FOV) + "\n"
+    return header
+
+
+def get_line(start, end):
+    """Bresenham's Line Algorithm
+       Produces a list of tuples from start and end
+       source: http://www.roguebasin.com/index.php?title=Bresenham%27s_Line_Algorithm#Python
+       see also: https://en.wikipedia.org/wiki/Bresenham%27s_line_algorithm
+
+       :param: start_point (x,y)
+       :param: end_point (x,y)
+       :returns: list_of_points
+       #>>> points1 = get_line((0, 0), (3, 4))
+       # >>> points2 = get_line((3, 4), (0, 0))
+       #>>> assert(set(points1) == set(points2))
+       #>>> print points1
+       #[(0, 0), (1, 1), (1, 2), (2, 3), (3, 4)]
+       #>>> print points2
+       #[(3, 4), (2, 3), (1, 2), (1, 1), (0, 0)]
+    """
+    # Setup initial conditions
+    x1, y1 = start
+    x2, y2 = end
+    dx = x2 - x1
+    dy = y2 - y1
+
+    # Determine how steep the line is
+    is_steep = abs(dy) > abs(dx)
+
+    # Rotate line
+    if is_steep:
+        x1, y1 = y1, x1
+        x2, y2 = y2, x2
+
+    # Swap start and end points if necessary and store swap state
+    swapped = False
+    if x1 > x2:
+        x1, x2 = x2, x1
+        y1, y2 = y2, y1
+        swapped = True
+
+    # Recalculate differentials
+    dx = x2 - x1
+    dy = y2 - y1
+
+    # Calculate error
+    error = int(dx / 2.0)
+    ystep = 1 if y1 < y2 else -1
+
+    # Iterate over bounding box generating points between start and end
+    y = y1
+    points = []
+    for x in range(x1, x2 + 1):
+        coord = (y, x) if is_steep else (x, y)
+        points.append(coord)
+        error -= abs(dy)
+        if error < 0:
+            y += ystep
+            error += dx
+
+    # Reverse the list if the coordinates were swapped
+    if swapped:
+        points.reverse()
+    return points
+
+
+if __name__ == "__main__":
+    print("this module is supposed to be imported from main.py or headless.py")
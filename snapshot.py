@@ -0,0 +1,66 @@
+"""immutable pictures of the world, handed from the simulation thread to the Viewer
+
+   the Viewer never reads Simulation while the simulation thread changes it. it asks for a snapshot of the
+   cells around its camera (SnapshotBuffer.request), the simulation thread makes the snapshot after its
+   next tick (take_snapshot) and hands it over (SnapshotBuffer.publish). the Viewer draws the newest snapshot
+   it has got (SnapshotBuffer.latest) and then asks for the next one. so a snapshot is made at most once per
+   drawn frame, however fast the simulation runs.
+"""
+import collections
+import threading
+
+from simulation import Simulation, Box
+
+# turn: Simulation.turns when the snapshot was made
+# rect: (x0, y0, x1, y1) the cells x0 <= x < x1, y0 <= y < y1 of the snapshot
+# colors: {(x, y): color of the agent, box or door to draw there}
+# fov_map: read-only copy of Simulation.fov_map[y0:y1, x0:x1]
+# game_over: True if no hider is left, this is the last snapshot of the episode
+Snapshot = collections.namedtuple("Snapshot", "turn rect colors fov_map game_over")
+
+
+def take_snapshot(rect):
+    """the agents, boxes, doors and the team fov of the cells in rect (x0, y0, x1, y1)"""
+    x0, y0, x1, y1 = rect
+    # boxes are drawn over agents, doors over both
+    colors = {}
+    occupancy = Simulation.occupancy
+    for y in range(y0, y1):
+        for x in range(x0, x1):
+            for thing in occupancy.get((x, y), ()):
+                if isinstance(thing, Box) or (x, y) not in colors:
+                    colors[(x, y)] = thing.color
+    for door in Simulation.doors:
+        if x0 <= door.x < x1 and y0 <= door.y < y1:
+            colors[(door.x, door.y)] = door.color
+    fov_map = Simulation.fov_map[y0:y1, x0:x1].copy()
+    fov_map.flags.writeable = False
+    return Snapshot(Simulation.turns, tuple(rect), colors, fov_map, Simulation.game_over())
+
+
+class SnapshotBuffer:
+    """double buffer between the simulation thread (writes) and the Viewer (reads)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.front = None  # the newest published snapshot
+        self.wanted = None  # rect of the snapshot the Viewer asked for, None: no snapshot wanted
+
+    def request(self, rect):
+        """the Viewer wants a snapshot of rect after the next tick"""
+        with self.lock:
+            self.wanted = tuple(rect)
+
+    def take_request(self):
+        """the rect the Viewer asked for (only once), or None"""
+        with self.lock:
+            rect, self.wanted = self.wanted, None
+            return rect
+
+    def publish(self, snapshot):
+        with self.lock:
+            self.front = snapshot
+
+    def latest(self):
+        with self.lock:
+            return self.front
@@ -0,0 +1,68 @@
+"""the doors that Simulation.update_doors opens and closes from the plate enter/leave events (plate_load,
+   triggered_keys) are the same as a full scan of all pressure plates would give, in every turn.
+   door_listeners hear about every door that opened or closed, and about nothing else
+
+   python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+else:
+    from simulation import Simulation
+
+
+def scanned_closed(door):
+    """the old rule: a door is closed unless a box or agent stands on a pressure plate with its key"""
+    return not any(Simulation.things_at(plate.x, plate.y)
+                   for plate in Simulation.pressureplates if plate.key == door.key)
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class DoorEventsTest(unittest.TestCase):
+    turns = 1500
+
+    def setUp(self):
+        patches = [mock.patch.object(Simulation, "num_seekers", 3), mock.patch.object(Simulation, "num_hiders", 3),
+                   mock.patch.object(Simulation, "datasets", False),
+                   mock.patch.object(Simulation, "door_listeners", [])]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_doors_follow_the_plates(self):
+        heard = []
+        Simulation.door_listeners.append(heard.append)
+        opened = 0
+        for seed in range(3):
+            Simulation.setup(40, 30, 65, seed=seed)
+            closed = {door: door.closed for door in Simulation.doors}
+            for turn in range(self.turns):
+                heard.clear()
+                Simulation.tick()
+                changed = []
+                for door in Simulation.doors:
+                    message = f"seed {seed}, turn {turn}, door at {door.x},{door.y}"
+                    self.assertEqual(door.closed, scanned_closed(door), message)
+                    self.assertEqual(Simulation.block_sight[door.y, door.x], door.closed, message)
+                    self.assertEqual(Simulation.block_movement[door.y, door.x], door.closed, message)
+                    if door.closed != closed[door]:
+                        changed.append(door)
+                        closed[door] = door.closed
+                    opened += not door.closed
+                self.assertEqual(sorted(map(id, heard)), sorted(map(id, changed)), f"seed {seed}, turn {turn}")
+                if Simulation.game_over():
+                    break
+        self.assertGreater(opened, 0)  # the doors did open now and then
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Simulation.free_cells and Simulation.free_index (the swap-remove index of the free floor cells) stay the same
+   as the floor cells without a box or an agent, after setup and after every turn with grabs and drops
+
+   python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+else:
+    from simulation import Simulation, FLOOR
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class FreeCellsTest(unittest.TestCase):
+    turns = 800
+
+    def setUp(self):
+        patches = [mock.patch.object(Simulation, "num_seekers", 3), mock.patch.object(Simulation, "num_hiders", 3),
+                   mock.patch.object(Simulation, "datasets", False)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def assert_free_cells(self, message):
+        expected = {y * Simulation.width + x for y, x in zip(*np.nonzero(Simulation.tile_types == FLOOR))
+                    if not Simulation.things_at(x, y)}
+        cells = Simulation.free_cells[:Simulation.free_count].tolist()
+        self.assertEqual(len(cells), len(set(cells)), message)
+        self.assertEqual(set(cells), expected, message)
+        for i, cell in enumerate(cells):
+            self.assertEqual(Simulation.free_index.flat[cell], i, message)
+        self.assertEqual((Simulation.free_index >= 0).sum(), Simulation.free_count, message)
+
+    def test_free_cells(self):
+        changes = 0  # grabs and drops
+        for seed in range(3):
+            Simulation.setup(40, 30, None, seed=seed)
+            things = list(Simulation.agents.values()) + Simulation.boxes
+            # setup puts every box and agent on a cell of its own
+            self.assertEqual(len({(t.x, t.y) for t in things}), len(things), f"seed {seed}")
+            self.assert_free_cells(f"seed {seed}, setup")
+            for turn in range(self.turns):
+                before = [agent.grabbing_state for agent in Simulation.agents.values()]
+                Simulation.tick()
+                changes += sum(agent.grabbing_state != state
+                               for agent, state in zip(Simulation.agents.values(), before))
+                self.assert_free_cells(f"seed {seed}, turn {turn}")
+                if Simulation.game_over():
+                    break
+        self.assertGreater(changes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""the field of view that Simulation.tick keeps (Agent.update_fov_map recomputes it only after a change nearby,
+   see Simulation.sight_changes) is the same as a fresh Agent.make_fov_map in every turn
+
+   python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+else:
+    from simulation import Simulation, Agent
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class IncrementalFovTest(unittest.TestCase):
+    turns = 400
+
+    def setUp(self):
+        patches = [mock.patch.object(Simulation, "num_seekers", 3), mock.patch.object(Simulation, "num_hiders", 3),
+                   mock.patch.object(Simulation, "datasets", False)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def check_fov(self, fov_algorithm, seed):
+        Simulation.fov_algorithm = fov_algorithm
+        Simulation.setup(40, 30, 65, seed=seed)
+        make_fov_map = Agent.make_fov_map
+        made = checked = 0
+
+        def counting_make_fov_map(agent, *args, **kwargs):
+            nonlocal made
+            made += 1
+            return make_fov_map(agent, *args, **kwargs)
+
+        with mock.patch.object(Agent, "make_fov_map", counting_make_fov_map):
+            for turn in range(self.turns):
+                Simulation.tick()
+                for agent in Simulation.agents.values():
+                    if agent.hp <= 0:
+                        continue
+                    kept, origin = agent.fov_map.copy(), agent.fov_origin
+                    make_fov_map(agent)  # not counted
+                    self.assertEqual(origin, agent.fov_origin, f"agent {agent.number}, turn {turn}")
+                    self.assertTrue(np.array_equal(kept, agent.fov_map), f"agent {agent.number}, turn {turn}")
+                    checked += 1
+                if Simulation.game_over():
+                    break
+        # the fov maps were not simply made new in every turn
+        self.assertLess(made, checked)
+
+    def test_raycasting(self):
+        original = Simulation.fov_algorithm
+        self.addCleanup(setattr, Simulation, "fov_algorithm", original)
+        for seed in range(2):
+            with self.subTest(seed=seed):
+                self.check_fov("raycasting", seed)
+
+    def test_shadowcasting(self):
+        original = Simulation.fov_algorithm
+        self.addCleanup(setattr, Simulation, "fov_algorithm", original)
+        for seed in range(2):
+            with self.subTest(seed=seed):
+                self.check_fov("shadowcasting", seed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""an episode recorded with headless.run_episode(record=True) and played again with headless.replay_episode
+   writes the same data files, byte for byte
+
+   python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+else:
+    import headless
+    from simulation import Simulation
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class ReplayTest(unittest.TestCase):
+    turns = 300
+
+    def setUp(self):
+        # replay_episode sets these from replay.json
+        patches = [mock.patch.object(Simulation, "num_seekers", 3), mock.patch.object(Simulation, "num_hiders", 3),
+                   mock.patch.object(Simulation, "fov_algorithm", "raycasting"),
+                   mock.patch.object(Simulation, "datasets", True)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_replay_writes_the_same_csv(self):
+        setup = Simulation.setup
+
+        def setup_with_other_rng(*args, **kwargs):
+            # the replay must not follow the random numbers of the recording, only the recorded actions
+            setup(*args, **kwargs)
+            Simulation.rng.seed(12345)
+
+        for seed in range(2):
+            with self.subTest(seed=seed):
+                recorded = os.path.join(self.directory, f"recorded_{seed}")
+                replayed = os.path.join(self.directory, f"replayed_{seed}")
+                headless.run_episode(recorded, seed=seed, record=True, max_turns=self.turns)
+                with mock.patch.object(Simulation, "setup", setup_with_other_rng), \
+                        contextlib.redirect_stdout(io.StringIO()):
+                    headless.replay_episode(os.path.join(recorded, "replay.json"), replayed)
+                for name in ("data_hiders.csv", "data_seekers.csv"):
+                    with open(os.path.join(recorded, name), "rb") as f:
+                        expected = f.read()
+                    with open(os.path.join(replayed, name), "rb") as f:
+                        self.assertEqual(f.read(), expected, f"seed {seed}, {name}")
+                    self.assertTrue(expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""VectorSimulation.step plays the same turns as Simulation.tick, on maze1 and on a map
+
+   both get the same actions: Simulation.tick replays them (see Simulation.replay), VectorSimulation.step gets
+   them as arrays. grab and kick pick the object with the same number in [0, 1) on both sides.
+
+   python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+else:
+    from simulation import Simulation, Agent
+    from map_loader import compile_map
+    from vector_simulation import VectorSimulation, GRAB, DROP, KICK, ACTION_DX, ACTION_DY
+
+# a map unlike maze1: a wall across the playfield with a door and a row of the plates that open it
+MAP_ROWS = (["#" * 40] + ["#" + "." * 38 + "#"] * 6 + ["#" + "a" * 38 + "#"] + ["#" + "." * 38 + "#"] * 6
+            + ["#" * 19 + "AA" + "#" * 19] + ["#" + "." * 38 + "#"] * 14 + ["#" * 40])
+MAP = "\n".join(MAP_ROWS)
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class VectorSimulationTest(unittest.TestCase):
+    turns = 300
+    worlds = 2
+
+    def play_both_ways(self, seed, game_map=None):
+        """plays self.turns turns with Simulation.tick and VectorSimulation.step, compares them after every turn"""
+        Simulation.setup(40, 30, 40, seed=seed, game_map=game_map)
+        vector = VectorSimulation.from_simulation(self.worlds, seed=seed)
+        agents = [Simulation.agents[number] for number in sorted(Simulation.agents)]
+        things = agents + Simulation.boxes
+        rng = np.random.default_rng(seed)
+        replay = []
+        choice = {}  # {agent number: number in [0, 1)} for grab and kick in this turn
+        replay_action = Agent.replay_action
+
+        def replay_with_choice(agent, action, argument=None):
+            # Agent.grab and Agent.kick without argument call rng.randrange(number of objects near the agent)
+            with mock.patch.object(Simulation.rng, "randrange", lambda n: int(choice[agent.number] * n)):
+                return replay_action(agent, action, argument)
+
+        with mock.patch.object(Simulation, "replay", replay), \
+                mock.patch.object(Agent, "replay_action", replay_with_choice):
+            for turn in range(self.turns):
+                actions = rng.integers(0, 8, len(agents))
+                choices = rng.random(len(agents))
+                recorded = {}
+                for i, agent in enumerate(agents):
+                    action = int(actions[i])
+                    if action <= 3:
+                        recorded[agent.number] = ("move", (int(ACTION_DX[action]), int(ACTION_DY[action])))
+                    else:
+                        recorded[agent.number] = ({GRAB: "grab", DROP: "drop", KICK: "kick"}.get(action, "wait"),
+                                                  None)
+                    choice[agent.number] = choices[i]
+                replay.append(recorded)
+                Simulation.tick()
+                vector.step(np.tile(actions, (self.worlds, 1)), np.tile(choices, (self.worlds, 1)))
+                self.assert_same(vector, agents, things, turn)
+
+    def assert_same(self, vector, agents, things, turn):
+        for w in range(self.worlds):
+            message = f"world {w}, turn {turn}"
+            self.assertEqual(vector.x[w].tolist(), [t.x for t in things], message)
+            self.assertEqual(vector.y[w].tolist(), [t.y for t in things], message)
+            self.assertEqual(vector.hp[w].tolist(), [a.hp for a in agents], message)
+            self.assertEqual(vector.turns_alive[w].tolist(), [a.turns_alive for a in agents], message)
+            self.assertEqual(vector.grabbed[w].tolist(),
+                             [things.index(a.grabbed_box) if a.grabbed_box is not None else -1 for a in agents],
+                             message)
+            boxes = slice(vector.num_agents, None)
+            self.assertEqual(vector.dx[w, boxes].tolist(), [b.dx for b in Simulation.boxes], message)
+            self.assertEqual(vector.dy[w, boxes].tolist(), [b.dy for b in Simulation.boxes], message)
+            self.assertEqual(vector.d[w, boxes].tolist(), [b.d for b in Simulation.boxes], message)
+            self.assertEqual(vector.door_closed[w].tolist(), [d.closed for d in Simulation.doors], message)
+            # the points of the turn (see Simulation.tick)
+            self.assertEqual(vector.hiders_alive()[w], Simulation.points_hiders[-1], message)
+            self.assertEqual(Simulation.num_hiders - vector.hiders_alive()[w], Simulation.points_seekers[-1],
+                             message)
+
+    def setUp(self):
+        patches = [mock.patch.object(Simulation, "num_seekers", 3), mock.patch.object(Simulation, "num_hiders", 3),
+                   mock.patch.object(Simulation, "datasets", False)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_maze1(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                self.play_both_ways(seed)
+
+    def test_map(self):
+        game_map = compile_map(MAP)
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                self.play_both_ways(seed, game_map)
+                # the vector worlds step on the walls of the map, not on maze1
+                vector = VectorSimulation.from_simulation(1)
+                self.assertTrue(np.array_equal(vector.tile_types, Simulation.tile_types))
+                self.assertEqual(len(vector.door_closed[0]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
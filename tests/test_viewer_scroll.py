@@ -0,0 +1,71 @@
+"""the Viewer keeps drawing while the camera scrolls. runs main.Viewer with the dummy SDL drivers
+
+   python -m unittest discover tests
+"""
+import collections
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+@unittest.skipIf(pygame is None, "needs pygame")
+class ViewerScrollTest(unittest.TestCase):
+    frames = 150
+
+    def setUp(self):
+        # the Viewer writes its dataset files into the working directory
+        self.old_cwd = os.getcwd()
+        self.tempdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tempdir.name)
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        self.tempdir.cleanup()
+
+    def test_frames_are_drawn_while_scrolling(self):
+        from main import Viewer, Simulation
+        draw = Viewer.draw
+        frame = 0
+        drawn_cameras = []  # camera position of every drawn frame
+
+        def counting_draw(viewer, snapshot):
+            draw(viewer, snapshot)
+            drawn_cameras.append((viewer.camera_x, viewer.camera_y))
+
+        def right_arrow_held():  # called once per frame
+            nonlocal frame
+            frame += 1
+            if frame == self.frames:
+                pygame.event.post(pygame.event.Event(pygame.QUIT))
+            keys = collections.defaultdict(int)
+            keys[pygame.K_RIGHT] = 1
+            return keys
+
+        Simulation.rng.seed(1)
+        with mock.patch.object(Viewer, "draw", counting_draw), \
+                mock.patch.object(pygame.key, "get_pressed", right_arrow_held), \
+                mock.patch.object(Simulation, "datasets", False):
+            # wide enough that the camera does not reach the right edge within self.frames frames
+            Viewer(world_width=self.frames + 100, world_height=30)
+
+        self.assertGreaterEqual(frame, self.frames)  # the quit event is handled in the next frame
+        # the camera moved one cell in every frame: most frames must have been drawn, each at a new position
+        self.assertGreater(len(drawn_cameras), self.frames // 2)
+        self.assertGreater(len(set(drawn_cameras)), self.frames // 2)
+        self.assertGreater(drawn_cameras[-1][0], self.frames // 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""per-phase timing of every tick, without cProfile
+
+   Simulation.tick, the Viewer and the headless runner call Simulation.profiler.lap(phase) after each
+   phase of a turn (agent actions, box physics, doors, fov, ...). the time since the last lap is added to
+   that phase. when the next turn starts, the sums of the finished turn go into one histogram per phase,
+   so a slow turn shows up in the histogram of the phase that caused it.
+
+   profiler.stats() returns the histograms, profiler.summary() a short text for the window caption.
+   with dump_file set, the stats are appended to that file as one json line every dump_interval seconds.
+"""
+import bisect
+import json
+import time
+
+# upper bounds of the histogram buckets in seconds: 10 us, 20 us, 40 us ... 0.65 s, and one bucket for all above
+BUCKETS = tuple(0.00001 * 2 ** k for k in range(17))
+
+
+class TickProfiler:
+
+    def __init__(self, enabled=True, dump_file=None, dump_interval=10.0):
+        self.enabled = enabled
+        self.dump_file = dump_file
+        self.dump_interval = dump_interval
+        self.reset()
+
+    def reset(self):
+        """forget all measurements"""
+        self.histograms = {}  # {phase: [count per bucket]}
+        self.totals = {}  # {phase: sum of all turns in seconds}
+        self.maxima = {}  # {phase: slowest turn in seconds}
+        self.recent = {}  # {phase: moving average of the last turns in seconds}
+        self.turns = 0
+        self.current = {}  # {phase: seconds} of the turn that is running
+        self.mark = time.perf_counter()
+        self.last_dump = time.monotonic()
+
+    def start(self):
+        """a new turn begins: the sums of the last turn go into the histograms"""
+        if not self.enabled:
+            return
+        if self.current:
+            self.turns += 1
+            for phase, seconds in self.current.items():
+                if phase not in self.histograms:
+                    self.histograms[phase] = [0] * (len(BUCKETS) + 1)
+                    self.totals[phase] = 0.0
+                    self.maxima[phase] = 0.0
+                    self.recent[phase] = seconds
+                self.histograms[phase][bisect.bisect_left(BUCKETS, seconds)] += 1
+                self.totals[phase] += seconds
+                self.maxima[phase] = max(self.maxima[phase], seconds)
+                self.recent[phase] += (seconds - self.recent[phase]) * 0.05
+            self.current = {}
+            if self.dump_file is not None and time.monotonic() - self.last_dump >= self.dump_interval:
+                self.dump()
+        self.mark = time.perf_counter()
+
+    def lap(self, phase):
+        """adds the time since the last lap (or start) to phase"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + now - self.mark
+        self.mark = now
+
+    def stats(self):
+        """returns {phase: {"turns", "mean_ms", "max_ms", "p50_ms", "p95_ms", "histogram"}}.
+           the percentiles are upper bounds of histogram buckets, histogram is a list of
+           [upper bound in ms (None for the last bucket), number of turns]
+        """
+        stats = {}
+        for phase, counts in self.histograms.items():
+            turns = sum(counts)
+            stats[phase] = {"turns": turns,
+                            "mean_ms": self.totals[phase] / turns * 1000,
+                            "max_ms": self.maxima[phase] * 1000,
+                            "p50_ms": self.percentile(phase, 0.5) * 1000,
+                            "p95_ms": self.percentile(phase, 0.95) * 1000,
+                            "histogram": [[bound * 1000 if bound is not None else None, count]
+                                          for bound, count in zip(BUCKETS + (None,), counts) if count]}
+        return stats
+
+    def percentile(self, phase, fraction):
+        """upper bound of the histogram bucket of phase that holds the given fraction of all turns"""
+        counts = self.histograms[phase]
+        needed = fraction * sum(counts)
+        seen = 0
+        for bound, count in zip(BUCKETS, counts):
+            seen += count
+            if seen >= needed:
+                return bound
+        return self.maxima[phase]  # in the last bucket, which has no upper bound
+
+    def summary(self, phases=3, exclude=("idle",)):
+        """the slowest phases of the last turns, like 'fov 0.42 ms, render 0.30 ms, actions 0.12 ms'.
+           idle (waiting for the fps clock of the Viewer or the tick rate) is left out by default.
+           the Viewer calls it while the simulation thread laps, list() copies the phases in one step
+        """
+        slowest = sorted(((phase, seconds) for phase, seconds in list(self.recent.items()) if phase not in exclude),
+                         key=lambda item: item[1], reverse=True)[:phases]
+        return ", ".join(f"{phase} {seconds * 1000:.2f} ms" for phase, seconds in slowest)
+
+    def dump(self):
+        """appends the stats as one json line to dump_file"""
+        with open(self.dump_file, "a") as f:
+            f.write(json.dumps({"time": time.time(), "turns": self.turns, "phases": self.stats()}) + "\n")
+        self.last_dump = time.monotonic()
@@ -0,0 +1,291 @@
+"""trains model_seekers.h5 and model_hiders.h5 (see model_registry.py) from recorded episodes,
+   without ever loading the whole corpus into memory
+
+   the corpus is every episode folder below the given paths, written by headless.py or rollout_farm.py
+   in the csv or in the binary format. every team file of an episode is a shard, shards are read in chunks:
+   1. one pass over all shards fits the min/max scaling of the features (MinMaxScaler.partial_fit)
+   2. every epoch reads the shards in a new random order, several at once, and mixes their rows in a
+      shuffle buffer of --buffer-rows rows before it cuts them into batches
+   3. a background thread prepares the next batches while the model trains on the current one
+   the scaling is folded into the first layer of the model, so the saved model takes the raw features of
+   Agent.smart_features like before. the model is also exported for the numpy backend (see numpy_model.py).
+
+   usage:
+   python train.py data --epochs 5 --batch-size 1024
+   python train.py data more_data --team seekers --buffer-rows 500000
+
+   the features are the 15 values of Agent.smart_features, the target is the Points column.
+   the enemy features are not in the dataset, they are counted from the enemies in the fov of the row
+   (around PosX, PosY), like Agent.check_for_enemies does. unlike there, enemies the team can not see are
+   missing and dead enemies count, the fov does not tell them apart. the csv format does not know the width
+   of the playfield, give it with --width if it is not 40.
+"""
+import argparse
+import itertools
+import os
+import queue
+import random
+import threading
+
+import numpy as np
+
+from binary_dataset import read_episode, TEAMS
+from model_registry import ModelRegistry
+from numpy_model import export
+from simulation import DATASET_COLUMNS_BEFORE_FOV, DATASET_COLUMNS_AFTER_FOV
+
+# the dataset columns that are features as they are: the action, RunAgainstWall and GrabbedSMTH
+ACTION_COLUMNS = DATASET_COLUMNS_BEFORE_FOV[:10]
+FEATURES = 15  # ACTION_COLUMNS, enemy north, east, south, west, BoxNextToMe
+ENEMY = 6  # code of an enemy in the fov, see simulation.fovmap_to_observation
+TORCH_RADIUS = 5  # of every Agent
+
+
+def find_shards(paths, seeker):
+    """all shards of one team below paths: ("csv", data_*.csv file) or ("binary", episode folder)"""
+    team = TEAMS[seeker]
+    shards = []
+    for path in paths:
+        for directory, folders, files in os.walk(path):
+            folders.sort()
+            if "meta.json" in files:
+                shards.append(("binary", directory))
+            elif f"data_{team}.csv" in files:
+                shards.append(("csv", os.path.join(directory, f"data_{team}.csv")))
+    return shards
+
+
+def enemy_features(observations, x, y):
+    """enemy north, east, south, west for every row, see Agent.check_for_enemies.
+       observations: uint8 array rows x height x width, x and y: position of the agent of each row
+    """
+    rows, height, width = observations.shape
+    enemies = np.zeros((rows, 4), dtype=np.float32)
+    r = TORCH_RADIUS
+    for dy in range(-r, r + 1):
+        for dx in range(-r, r + 1):
+            if dx * dx + dy * dy > r * r or dx == dy == 0:
+                continue
+            cx, cy = x + dx, y + dy
+            inside = (0 <= cx) & (cx < width) & (0 <= cy) & (cy < height)
+            enemy = np.zeros(rows, dtype=bool)
+            enemy[inside] = observations[np.flatnonzero(inside), cy[inside], cx[inside]] == ENEMY
+            if dy < 0:
+                enemies[enemy, 0] += r + dy
+            if dx > 0:
+                enemies[enemy, 1] += r - dx
+            if dy > 0:
+                enemies[enemy, 2] += r - dy
+            if dx < 0:
+                enemies[enemy, 3] += r + dx
+    return enemies
+
+
+def make_features(columns, observations):
+    """features (rows x FEATURES) and targets (rows) of one chunk.
+       columns: {column name: array}, observations: uint8 array rows x height x width
+    """
+    x = np.asarray(columns["PosX"], dtype=np.int64)
+    y = np.asarray(columns["PosY"], dtype=np.int64)
+    features = np.column_stack([np.asarray(columns[name], dtype=np.float32) for name in ACTION_COLUMNS]
+                               + [enemy_features(observations, x, y),
+                                  np.asarray(columns["BoxNextToMe"], dtype=np.float32)])
+    return features, np.asarray(columns["Points"], dtype=np.float32)
+
+
+def read_csv_chunks(filename, chunk_rows, width=40):
+    """yields (features, targets) of chunk_rows rows of a data_*.csv file at a time.
+       every fov column is a line of the playfield, as a number with one digit per cell
+    """
+    before, after = len(DATASET_COLUMNS_BEFORE_FOV), len(DATASET_COLUMNS_AFTER_FOV)
+    with open(filename) as f:
+        height = len(f.readline().split(",")) - before - after
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if not lines:
+                return
+            cells = [line.rstrip("\n").split(",") for line in lines]
+            table = np.array([row[:before] + row[-after:] for row in cells], dtype=np.int64)
+            fov = "".join(value.zfill(width) for row in cells for value in row[before:before + height])
+            if len(fov) != len(cells) * height * width:
+                raise ValueError(f"{filename}: the fov is wider than {width} cells, see --width")
+            observations = (np.frombuffer(fov.encode(), dtype=np.uint8) - ord("0")).reshape(-1, height, width)
+            columns = dict(zip(DATASET_COLUMNS_BEFORE_FOV + DATASET_COLUMNS_AFTER_FOV, table.T))
+            yield make_features(columns, observations)
+
+
+def read_binary_chunks(directory, seeker, chunk_rows):
+    """yields (features, targets) of chunk_rows rows of one team of a binary episode at a time"""
+    columns = read_episode(directory)[TEAMS[seeker]]
+    for start in range(0, len(columns["Points"]), chunk_rows):
+        chunk = {name: column[start:start + chunk_rows] for name, column in columns.items()}
+        yield make_features(chunk, chunk["fov"])
+
+
+def read_shard(shard, seeker, chunk_rows, width=40):
+    kind, path = shard
+    if kind == "binary":
+        return read_binary_chunks(path, seeker, chunk_rows)
+    return read_csv_chunks(path, chunk_rows, width)
+
+
+def fit_scaler(shards, seeker, chunk_rows=10000, width=40):
+    """min and max of every feature over all shards, one chunk in memory at a time"""
+    from sklearn.preprocessing import MinMaxScaler
+    scaler = MinMaxScaler()
+    rows = 0
+    for shard in shards:
+        for features, targets in read_shard(shard, seeker, chunk_rows, width):
+            if len(features):
+                scaler.partial_fit(features)
+                rows += len(features)
+    if not rows:
+        raise ValueError(f"no rows of the {TEAMS[seeker]} in the corpus")
+    return scaler, rows
+
+
+def shuffled_batches(shards, seeker, batch_size, scale, offset, rng, buffer_rows=200000, interleave=8,
+                     chunk_rows=10000, width=40):
+    """yields scaled (features, targets) batches of one epoch.
+       the shards are read in random order, interleave of them at once, and their chunks are mixed in a
+       buffer of about buffer_rows rows. the last batch of the epoch may be smaller than batch_size
+    """
+    order = list(shards)
+    rng.shuffle(order)
+    open_shards = []
+    buffered = []  # [(features, targets)]
+    buffered_rows = 0
+    while order or open_shards:
+        while order and len(open_shards) < interleave:
+            open_shards.append(read_shard(order.pop(), seeker, chunk_rows, width))
+        reader = open_shards[rng.randrange(len(open_shards))]
+        chunk = next(reader, None)
+        if chunk is None:
+            open_shards.remove(reader)
+        elif len(chunk[0]):
+            buffered.append(chunk)
+            buffered_rows += len(chunk[0])
+        if buffered_rows >= buffer_rows or (buffered_rows and not (order or open_shards)):
+            features = np.concatenate([f for f, t in buffered])
+            targets = np.concatenate([t for f, t in buffered])
+            permutation = np.random.default_rng(rng.randrange(2 ** 32)).permutation(len(targets))
+            features, targets = features[permutation], targets[permutation]
+            # full batches leave, the rest stays in the buffer and is mixed with the next chunks
+            full = len(targets) // batch_size * batch_size if (order or open_shards) else len(targets)
+            for start in range(0, full, batch_size):
+                yield features[start:start + batch_size] * scale + offset, targets[start:start + batch_size]
+            buffered = [(features[full:], targets[full:])] if full < len(targets) else []
+            buffered_rows = len(targets) - full
+
+
+def prefetch(batches, size=4):
+    """runs the batches generator in a background thread, up to size batches ahead of the consumer"""
+    ready = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        """False if the consumer has stopped"""
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for batch in batches:
+                if not put(batch):
+                    return
+            put(done)
+        except Exception as error:  # handed to the consumer, raised there
+            put(error)
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = ready.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def build_model(features=FEATURES):
+    """the network that predicts the points of an action"""
+    from tensorflow import keras
+    model = keras.Sequential([keras.Input(shape=(features,)),
+                              keras.layers.Dense(64, activation="relu"),
+                              keras.layers.Dense(32, activation="relu"),
+                              keras.layers.Dense(1)])
+    model.compile(optimizer="adam", loss="mse")
+    return model
+
+
+def fold_scaling(model, scale, offset):
+    """changes the first layer so that the model takes unscaled features:
+       (x * scale + offset) @ w + b == x @ (scale * w) + (offset @ w + b)
+    """
+    layer = model.layers[0]
+    w, b = layer.get_weights()
+    layer.set_weights([w * scale[:, None], b + offset @ w])
+
+
+def train_team(seeker, paths, epochs=5, batch_size=1024, buffer_rows=200000, interleave=8, chunk_rows=10000,
+               width=40, seed=None, filename=None):
+    """trains and saves the model of one team (default file: ModelRegistry.filenames[seeker]),
+       and the .npz file with the same name for the numpy backend
+    """
+    team = TEAMS[seeker]
+    shards = find_shards(paths, seeker)
+    if not shards:
+        raise ValueError(f"no episodes with {team} in {', '.join(paths)}")
+    scaler, rows = fit_scaler(shards, seeker, chunk_rows, width)
+    scale, offset = scaler.scale_.astype(np.float32), scaler.min_.astype(np.float32)
+    print(f"{team}: {rows} rows in {len(shards)} shards")
+    rng = random.Random(seed)
+    model = build_model()
+    for epoch in range(epochs):
+        losses = []
+        for features, targets in prefetch(shuffled_batches(shards, seeker, batch_size, scale, offset, rng,
+                                                           buffer_rows, interleave, chunk_rows, width)):
+            losses.append(float(model.train_on_batch(features, targets)))
+        print(f"{team}: epoch {epoch + 1}/{epochs}, loss {np.mean(losses):.4f}")
+    fold_scaling(model, scale, offset)
+    filename = filename or ModelRegistry.filenames[seeker]
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    # a running simulation reloads the model when the file changes, so it must never see a half-written file
+    temporary = os.path.splitext(filename)[0] + ".training.h5"
+    model.save(temporary)
+    os.replace(temporary, filename)
+    export(model, os.path.splitext(filename)[0] + ".npz")
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="train the models of the seekers and hiders from recorded episodes")
+    parser.add_argument("paths", nargs="+", help="folders with episodes (csv or binary format)")
+    parser.add_argument("--team", choices=("seekers", "hiders", "both"), default="both")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--buffer-rows", type=int, default=200000,
+                        help="rows in the shuffle buffer, more rows mix better but need more memory")
+    parser.add_argument("--interleave", type=int, default=8, help="shards that are read at the same time")
+    parser.add_argument("--chunk-rows", type=int, default=10000, help="rows read from a shard at a time")
+    parser.add_argument("--width", type=int, default=40, help="width of the playfield of the csv episodes")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the shuffling")
+    args = parser.parse_args(argv)
+    for seeker in (True, False):
+        if args.team in ("both", TEAMS[seeker]):
+            train_team(seeker, args.paths, args.epochs, args.batch_size, args.buffer_rows, args.interleave,
+                       args.chunk_rows, args.width, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""many independent worlds in numpy arrays, stepped together
+
+   Simulation keeps one world in class attributes and calls a python method per agent and per box.
+   VectorSimulation keeps n worlds of the same size, with the same maze (maze1 or the tile types of a map,
+   see map_loader.py) and the same number of agents and boxes,
+   in struct-of-arrays form: one array per property with the world as first axis.
+   step() plays one turn in all worlds at once. agents and boxes are still handled one after another
+   (like Simulation.tick does), but each of these steps is a numpy operation over all worlds.
+
+   agents and boxes are "entities": entity 0 .. agents-1 are the agents (seekers first), the rest are boxes.
+   every cell holds at most one entity, cell[world, y, x] is its number or -1.
+
+   the rules are the same as in Agent.move, Agent.grab, Agent.drop, Agent.kick and Box.move.
+   not vectorized: field of view, datasets and colors.
+
+   usage (benchmark):
+   python vector_simulation.py --worlds 1000 --turns 100
+   python vector_simulation.py --worlds 1000 --turns 100 --map maps/maze1.txt
+"""
+import argparse
+import time
+
+import numpy as np
+
+from simulation import Simulation, make_tile_types, BLOCK_MOVEMENT, FLOOR, DOOR
+from map_loader import MapCache
+
+# actions, in the same order as the predictions of the models (see Agent.smart_action)
+NORTH, EAST, SOUTH, WEST, GRAB, DROP, KICK, WAIT = range(8)
+ACTION_DX = np.array([0, 1, 0, -1, 0, 0, 0, 0])
+ACTION_DY = np.array([-1, 0, 1, 0, 0, 0, 0, 0])
+# the 4 neighbors in the order of Agent.get_objects_near_me
+NEIGHBORS = ((0, -1), (-1, 0), (1, 0), (0, 1))
+FRICTIONS = np.array([32, 64, 96, 128, 160, 192, 224, 255])  # see Box.__init__
+
+
+class VectorSimulation:
+
+    def __init__(self, worlds, width=40, height=30, boxes=65, seekers=3, hiders=3, seed=None,
+                 tile_types=None, plates=(), doors=()):
+        """creates worlds independent worlds, each with its own random positions of agents and boxes.
+           tile_types: uint8 array [y, x] of tile type codes instead of maze1, its size replaces width and height.
+           plates and doors: the pressure plates and doors on tile_types, each as (x, y, key).
+           for a map: tile_types=game_map.tile_types, plates=game_map.plates, doors=game_map.doors
+        """
+        if tile_types is None:
+            tile_types, plates, doors = make_tile_types(width, height)
+        else:
+            height, width = tile_types.shape
+        self.worlds = worlds
+        self.width = width
+        self.height = height
+        self.num_boxes = boxes
+        self.num_seekers = seekers
+        self.num_hiders = hiders
+        self.num_agents = seekers + hiders
+        self.entities = self.num_agents + boxes
+        self.rng = np.random.default_rng(seed)
+        self.seeker = np.arange(self.num_agents) < seekers  # [agent] -> True for seekers
+
+        self.tile_types = tile_types
+        # walls etc. never change, only the doors do
+        self.static_block = BLOCK_MOVEMENT[self.tile_types] & (self.tile_types != DOOR)
+        self.plate_x = np.array([x for x, y, key in plates], dtype=int)
+        self.plate_y = np.array([y for x, y, key in plates], dtype=int)
+        self.plate_key = np.array([key for x, y, key in plates], dtype=int)
+        self.door_x = np.array([x for x, y, key in doors], dtype=int)
+        self.door_y = np.array([y for x, y, key in doors], dtype=int)
+        self.door_key = np.array([key for x, y, key in doors], dtype=int)
+        self.floor_cells = np.flatnonzero(self.tile_types == FLOOR)  # where agents and boxes can be placed
+
+        n, e = worlds, self.entities
+        self.x = np.zeros((n, e), dtype=int)  # [world, entity]
+        self.y = np.zeros((n, e), dtype=int)
+        self.dx = np.zeros((n, e), dtype=int)  # kick impulse, only boxes move by it
+        self.dy = np.zeros((n, e), dtype=int)
+        self.d = np.zeros((n, e), dtype=int)  # distance moved since the kick, in pixels (see Box.move)
+        self.friction = np.zeros((n, e), dtype=int)
+        self.locked = np.zeros((n, e), dtype=bool)
+        self.hp = np.zeros((n, self.num_agents), dtype=int)  # [world, agent]
+        self.grabbed = np.full((n, self.num_agents), -1, dtype=int)  # entity grabbed by the agent, or -1
+        self.turns_alive = np.zeros((n, self.num_agents), dtype=int)
+        self.door_closed = np.ones((n, len(doors)), dtype=bool)  # [world, door]
+        self.block_movement = np.zeros((n, height, width), dtype=bool)  # [world, y, x]
+        self.cell = np.full((n, height, width), -1, dtype=np.int16)  # [world, y, x] -> entity or -1
+        self.turns = np.zeros(n, dtype=int)
+        self.reset()
+
+    @classmethod
+    def from_simulation(cls, worlds, seed=None):
+        """makes worlds copies of the current world of Simulation, on the same maze or map (the agents must be
+           numbered 0, 1, ... with the seekers first, no two boxes or agents may stand on the same cell)
+        """
+        agents = [Simulation.agents[number] for number in sorted(Simulation.agents)]
+        seekers = sum(a.seeker for a in agents)
+        if [a.seeker for a in agents] != [True] * seekers + [False] * (len(agents) - seekers):
+            raise ValueError("the seekers must have lower numbers than the hiders")
+        things = agents + Simulation.boxes
+        if len({(t.x, t.y) for t in things}) != len(things):
+            raise ValueError("two boxes or agents stand on the same cell")
+        vector = cls(worlds, Simulation.width, Simulation.height, len(Simulation.boxes), seekers,
+                     len(agents) - seekers, seed, tile_types=Simulation.tile_types.copy(),
+                     plates=[(plate.x, plate.y, plate.key) for plate in Simulation.pressureplates],
+                     doors=[(door.x, door.y, door.key) for door in Simulation.doors])
+        vector.cell[...] = -1
+        for e, thing in enumerate(things):
+            vector.x[:, e] = thing.x
+            vector.y[:, e] = thing.y
+            vector.cell[:, thing.y, thing.x] = e
+        for b, box in enumerate(Simulation.boxes, start=vector.num_agents):
+            vector.dx[:, b], vector.dy[:, b], vector.d[:, b] = box.dx, box.dy, box.d
+            vector.friction[:, b] = box.friction
+            vector.locked[:, b] = box.locked
+        for i, agent in enumerate(agents):
+            vector.hp[:, i] = agent.hp
+            vector.turns_alive[:, i] = agent.turns_alive
+            vector.grabbed[:, i] = things.index(agent.grabbed_box) if agent.grabbing_state else -1
+        vector.turns[:] = Simulation.turns
+        vector.update_doors()
+        return vector
+
+    def reset(self, mask=None):
+        """starts new episodes in the worlds where mask is True (default: in all worlds)"""
+        worlds = np.arange(self.worlds) if mask is None else np.flatnonzero(mask)
+        if len(worlds) == 0:
+            return
+        # every world gets its own random floor cells, no two entities on the same cell
+        order = self.rng.random((len(worlds), len(self.floor_cells))).argsort(axis=1)[:, :self.entities]
+        places = self.floor_cells[order]
+        self.x[worlds] = places % self.width
+        self.y[worlds] = places // self.width
+        self.cell[worlds] = -1
+        self.cell[worlds[:, None], self.y[worlds], self.x[worlds]] = np.arange(self.entities)
+        self.dx[worlds] = 0
+        self.dy[worlds] = 0
+        self.d[worlds] = 0
+        self.friction[worlds] = self.rng.choice(FRICTIONS, size=(len(worlds), self.entities))
+        self.locked[worlds] = False
+        self.hp[worlds] = 1
+        self.grabbed[worlds] = -1
+        self.turns_alive[worlds] = 0
+        self.turns[worlds] = 0
+        self.update_doors()
+
+    def update_doors(self):
+        """a door is open while any box or agent stands on a pressure plate with the door's key"""
+        pressed = self.cell[:, self.plate_y, self.plate_x] >= 0  # [world, plate]
+        for key in np.unique(self.door_key):
+            self.door_closed[:, self.door_key == key] = ~pressed[:, self.plate_key == key].any(axis=1,
+                                                                                             keepdims=True)
+        self.block_movement[...] = self.static_block
+        self.block_movement[:, self.door_y, self.door_x] = self.door_closed
+
+    def objects_near(self, agent):
+        """the boxes and corpses next to agent, like Agent.get_objects_near_me
+
+           returns: entity numbers [world, 4 neighbors] (-1 for nothing) and a bool mask of the usable ones
+        """
+        near = np.stack([self.cell[np.arange(self.worlds), self.y[:, agent] + dy, self.x[:, agent] + dx]
+                         for dx, dy in NEIGHBORS], axis=1).astype(int)
+        agent_hp = np.take_along_axis(self.hp, np.clip(near, 0, self.num_agents - 1), axis=1)
+        usable = (near >= self.num_agents) | ((near >= 0) & (agent_hp <= 0))
+        return near, usable
+
+    def random_actions(self, agent, near):
+        """the choice of Agent.random_action in every world: wait, move in a random direction,
+           kick (if something is near), grab (if something is near and nothing is grabbed) or
+           drop (if something is grabbed), all possible actions with the same chance
+        """
+        grabbing = self.grabbed[:, agent] >= 0
+        # possible actions in this order: wait, move, kick, grab, drop
+        possible = np.stack([np.ones(self.worlds, dtype=bool), np.ones(self.worlds, dtype=bool),
+                             near, near & ~grabbing, grabbing], axis=1)
+        pick = (self.rng.random(self.worlds) * possible.sum(axis=1)).astype(int)
+        slot = (possible.cumsum(axis=1) > pick[:, None]).argmax(axis=1)
+        directions = np.array([NORTH, WEST, EAST, SOUTH])  # order of Agent.move_random
+        return np.array([WAIT, 0, KICK, GRAB, DROP])[slot] * (slot != 1) + \
+            directions[self.rng.integers(0, 4, self.worlds)] * (slot == 1)
+
+    def step(self, actions=None, choices=None):
+        """plays one turn in all worlds.
+           actions: int array [world, agent] of NORTH ... WAIT, None means random actions (like Agent.random_action)
+           choices: float array [world, agent] in [0, 1), picks the object to grab or kick when there
+                    are several (default: random)
+        """
+        w = np.arange(self.worlds)
+        if choices is None:
+            choices = self.rng.random((self.worlds, self.num_agents))
+        for i in range(self.num_agents):
+            alive = self.hp[:, i] > 0
+            near, usable = self.objects_near(i)
+            action = self.random_actions(i, usable.any(axis=1)) if actions is None else actions[:, i]
+            self.turns_alive[alive, i] += 1
+            grabbing = self.grabbed[:, i] >= 0
+            # ---- grab and kick take one of the objects near the agent ----
+            count = usable.sum(axis=1)
+            pick = (choices[:, i] * count).astype(int)
+            chosen = near[w, (usable.cumsum(axis=1) > pick[:, None]).argmax(axis=1)]
+            grab = alive & (action == GRAB) & ~grabbing & (count > 0)
+            self.grabbed[grab, i] = chosen[grab]
+            kick = alive & (action == KICK) & ~grabbing & (count > 0)
+            kicked = chosen[kick]
+            self.dx[w[kick], kicked] = self.x[w[kick], kicked] - self.x[kick, i]
+            self.dy[w[kick], kicked] = self.y[w[kick], kicked] - self.y[kick, i]
+            # ---- drop ----
+            self.grabbed[alive & (action == DROP), i] = -1
+            # ---- move ----
+            moving = alive & (action <= WEST)
+            tx = self.x[:, i] + ACTION_DX[action]
+            ty = self.y[:, i] + ACTION_DY[action]
+            moving &= ~self.block_movement[w, ty, tx]
+            other = self.cell[w, ty, tx].astype(int)
+            other_agent = moving & (other >= 0) & (other < self.num_agents)
+            # run into another agent: a seeker kills a living hider, a hider dies when it runs into a seeker
+            other_seeker = self.seeker[np.clip(other, 0, self.num_agents - 1)]
+            kill = other_agent & self.seeker[i] & ~other_seeker
+            kill &= self.hp[w, np.clip(other, 0, self.num_agents - 1)] > 0
+            self.hp[w[kill], other[kill]] = 0
+            if not self.seeker[i]:
+                self.hp[other_agent & other_seeker, i] = 0
+            # the grabbed box is the only thing the agent can walk into, it swaps places with the agent
+            moving &= ~other_agent & ((other < 0) | (other == self.grabbed[:, i]))
+            m = w[moving]
+            old_x, old_y = self.x[m, i], self.y[m, i]
+            box = self.grabbed[m, i]
+            with_box = box >= 0
+            self.cell[m[with_box], self.y[m[with_box], box[with_box]], self.x[m[with_box], box[with_box]]] = -1
+            self.cell[m, old_y, old_x] = -1
+            self.cell[m, ty[m], tx[m]] = i
+            self.x[m, i], self.y[m, i] = tx[m], ty[m]
+            self.x[m[with_box], box[with_box]] = old_x[with_box]
+            self.y[m[with_box], box[with_box]] = old_y[with_box]
+            self.cell[m[with_box], old_y[with_box], old_x[with_box]] = box[with_box]
+        for b in range(self.num_agents, self.entities):
+            self.move_box(b)
+        self.update_doors()
+        self.turns += 1
+
+    def move_box(self, b):
+        """Box.move for box number b in all worlds"""
+        w = np.arange(self.worlds)
+        self.dx[self.locked[:, b], b] = 0
+        self.dy[self.locked[:, b], b] = 0
+        moving = (self.dx[:, b] != 0) | (self.dy[:, b] != 0)
+        tx = self.x[:, b] + self.dx[:, b]
+        ty = self.y[:, b] + self.dy[:, b]
+        stop = moving & self.block_movement[w, ty, tx]
+        other = self.cell[w, ty, tx].astype(int)
+        # bumping into another box passes the impulse on
+        bump = moving & ~stop & (other >= self.num_agents)
+        self.dx[w[bump], other[bump]] = self.dx[bump, b]
+        self.dy[w[bump], other[bump]] = self.dy[bump, b]
+        stop |= moving & (other >= 0)  # a box, an agent or a corpse is in the way
+        self.dx[stop, b] = 0
+        self.dy[stop, b] = 0
+        m = w[moving & ~stop]
+        self.cell[m, self.y[m, b], self.x[m, b]] = -1
+        self.cell[m, ty[m], tx[m]] = b
+        self.x[m, b], self.y[m, b] = tx[m], ty[m]
+        self.d[m, b] += Simulation.cell_size
+        tired = m[self.d[m, b] > self.friction[m, b]]
+        self.dx[tired, b] = 0
+        self.dy[tired, b] = 0
+        self.d[tired, b] = 0
+
+    def hiders_alive(self):
+        """number of living hiders in every world"""
+        return (self.hp[:, ~self.seeker] > 0).sum(axis=1)
+
+    def game_over(self):
+        """True for every world without a living hider"""
+        return self.hiders_alive() == 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="step many worlds with random actions and measure the speed")
+    parser.add_argument("--worlds", type=int, default=1000, help="number of worlds")
+    parser.add_argument("--turns", type=int, default=100, help="turns to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator")
+    parser.add_argument("--map", default=None, help="map file (see map_loader.py) instead of the built-in maze")
+    args = parser.parse_args(argv)
+    if args.map is not None:
+        game_map = MapCache.load(args.map)
+        vector = VectorSimulation(args.worlds, seed=args.seed, tile_types=game_map.tile_types,
+                                  plates=game_map.plates, doors=game_map.doors)
+    else:
+        vector = VectorSimulation(args.worlds, seed=args.seed)
+    start = time.perf_counter()
+    for _ in range(args.turns):
+        vector.step()
+        vector.reset(vector.game_over())
+    seconds = time.perf_counter() - start
+    print(f"{args.worlds} worlds x {args.turns} turns in {seconds:.2f} seconds: "
+          f"{args.worlds * args.turns / seconds:.0f} world turns per second")
+
+
+if __name__ == "__main__":
+    main()